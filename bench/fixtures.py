@@ -0,0 +1,247 @@
+"""Local stand-in for Instagram, its CDN and the Supabase Storage/REST APIs."""
+
+from __future__ import annotations
+
+import hashlib
+import html
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Any, Dict
+from urllib.parse import parse_qs, urlparse
+
+_URL_KEYS = ("display_url", "thumbnail_src", "url")
+
+
+def make_jpeg(size: int, quality: int = 90) -> bytes:
+    """A noisy photo-like JPEG, so encoders do real work on it."""
+    from PIL import Image
+
+    img = Image.effect_noise((size, size), 64).convert("RGB")
+    out = BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def synthetic_profile(base_url: str, username: str, posts: int) -> Dict[str, Any]:
+    """A ``web_profile_info`` payload with ``posts`` image posts on our CDN."""
+    now = int(time.time())
+    edges = []
+    for i in range(posts):
+        code = hashlib.sha1(f"{username}/{i}".encode()).hexdigest()[:11]
+        edges.append(
+            {
+                "node": {
+                    "shortcode": code,
+                    "display_url": f"{base_url}/cdn/{username}/{i}.jpg",
+                    "taken_at_timestamp": now - i * 3600,
+                    "is_video": False,
+                    "edge_media_to_caption": {
+                        "edges": [{"node": {"text": f"Post {i} by {username} #bench"}}]
+                    },
+                }
+            }
+        )
+    return {
+        "data": {
+            "user": {
+                "username": username,
+                "is_private": False,
+                "edge_owner_to_timeline_media": {
+                    "count": posts,
+                    "page_info": {"has_next_page": False, "end_cursor": None},
+                    "edges": edges,
+                },
+            }
+        },
+        "status": "ok",
+    }
+
+
+def _localize(payload: Any, base_url: str) -> Any:
+    """Point the media URLs of a recorded payload at the local CDN."""
+    if isinstance(payload, list):
+        return [_localize(v, base_url) for v in payload]
+    if not isinstance(payload, dict):
+        return payload
+    out = {}
+    for key, value in payload.items():
+        if key in _URL_KEYS and isinstance(value, str) and value.startswith("http"):
+            digest = hashlib.sha1(value.encode()).hexdigest()[:16]
+            out[key] = f"{base_url}/cdn/recorded/{digest}.jpg"
+        else:
+            out[key] = _localize(value, base_url)
+    return out
+
+
+def profile_html(username: str, payload: Dict[str, Any]) -> str:
+    """Profile page with the payload embedded as JSON and a rendered post grid."""
+    from utils.instagram_api import parse_posts
+
+    tiles = []
+    for post in parse_posts(payload):
+        tiles.append(
+            f'<div><a href="/p/{html.escape(post["shortcode"] or "")}/">'
+            f'<img src="{html.escape(post["img_src"])}" alt=""></a>'
+            f"<h2><span>{html.escape(post['img_caption'])}</span></h2></div>"
+        )
+    blob = json.dumps(payload).replace("</", "<\\/")
+    return (
+        f"<!DOCTYPE html><html><head><title>@{html.escape(username)}</title>"
+        f'<script type="application/json" data-sjs>{blob}</script></head>'
+        f"<body><main><article>{''.join(tiles)}</article></main></body></html>"
+    )
+
+
+class FixtureServer:
+    """Threaded HTTP server for the benchmark.
+
+    Routes: ``/api/v1/users/web_profile_info/?username=`` and ``/<username>/``
+    (recorded payloads from ``fixtures_dir/<username>.json`` when present,
+    synthetic ones otherwise), ``/cdn/...`` (JPEGs, unique bytes per URL),
+    Supabase's ``/storage/v1/object[/list]/...`` and ``/rest/v1/assets``, and
+    an OpenAI-compatible ``/v1/chat/completions`` stub.
+    ``latency_ms`` delays every response. ``stats`` counts requests and bytes.
+    """
+
+    def __init__(
+        self,
+        posts: int = 12,
+        image_size: int = 1080,
+        latency_ms: float = 0,
+        fixtures_dir: str | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.posts = posts
+        self.latency = latency_ms / 1000.0
+        self.fixtures_dir = fixtures_dir
+        self.image = make_jpeg(image_size)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.reset_stats()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self._httpd.server_port}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = {
+                "requests": 0,
+                "bytes_in": 0,
+                "bytes_out": 0,
+                "uploads": 0,
+                "rows": 0,
+                "ai_calls": 0,
+            }
+
+    def _count(self, **deltas: int) -> None:
+        with self._lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def profile_payload(self, username: str) -> Dict[str, Any]:
+        if self.fixtures_dir:
+            path = os.path.join(self.fixtures_dir, f"{username}.json")
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    return _localize(json.load(f), self.base_url)
+        return synthetic_profile(self.base_url, username, self.posts)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes, ctype: str) -> None:
+                if server.latency:
+                    time.sleep(server.latency)
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server._count(requests=1, bytes_out=len(body))
+
+            def _json(self, value: Any, status: int = 200) -> None:
+                self._reply(status, json.dumps(value).encode("utf-8"), "application/json")
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path
+                if path.startswith("/api/v1/users/web_profile_info/"):
+                    username = (parse_qs(url.query).get("username") or [""])[0]
+                    return self._json(server.profile_payload(username))
+                if path.startswith("/cdn/"):
+                    # Trailing bytes after EOI keep every image distinct for the sha1 dedupe
+                    return self._reply(200, server.image + path.encode("utf-8"), "image/jpeg")
+                parts = [p for p in path.split("/") if p]
+                if len(parts) == 1:
+                    page = profile_html(parts[0], server.profile_payload(parts[0]))
+                    return self._reply(200, page.encode("utf-8"), "text/html; charset=utf-8")
+                self._reply(404, b"not found", "text/plain")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                server._count(bytes_in=length)
+                path = urlparse(self.path).path
+                if path.startswith("/storage/v1/object/list/"):
+                    return self._json([])
+                if path.startswith("/storage/v1/object/"):
+                    server._count(uploads=1)
+                    return self._json({"Key": path[len("/storage/v1/object/"):]})
+                if path == "/rest/v1/assets":
+                    rows = json.loads(body or b"[]")
+                    rows = rows if isinstance(rows, list) else [rows]
+                    with server._lock:
+                        for row in rows:
+                            server._next_id += 1
+                            row["id"] = server._next_id
+                    server._count(rows=len(rows))
+                    return self._json(rows, 201)
+                if path == "/v1/chat/completions":
+                    request = json.loads(body or b"{}")
+                    server._count(ai_calls=1)
+                    content = {"title": "Bench image", "description": f"{length} bytes described."}
+                    return self._json(
+                        {
+                            "id": "chatcmpl-bench",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": request.get("model", "bench"),
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "message": {"role": "assistant", "content": json.dumps(content)},
+                                    "finish_reason": "stop",
+                                }
+                            ],
+                            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                        }
+                    )
+                self._reply(404, b"not found", "text/plain")
+
+        return Handler
+
+    def start(self) -> "FixtureServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FixtureServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
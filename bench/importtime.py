@@ -0,0 +1,74 @@
+"""Import-time budget for the CLI entry points, measured with ``-X importtime``.
+
+Fails (exit 1) when an entry point takes longer than the budget to import,
+or loads a heavy dependency that only some code paths need.
+
+    python -m bench.importtime --budget-ms 150 --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+ENTRY_POINTS = ("launch", "launch_and_store", "worker", "scraper")
+# Browser, proxy/capture, WebP, AI and HTTP client stacks load on first use
+LAZY_MODULES = ("selenium", "seleniumwire", "PIL", "openai", "requests", "httpx")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str) -> Tuple[float, Set[str]]:
+    """Cumulative import time of ``module`` (ms) and the top-level packages it loaded."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip()}")
+    total_us = 0
+    loaded: Set[str] = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        name = name.strip()
+        loaded.add(name.split(".", 1)[0])
+        if name == module:
+            total_us = int(cumulative.strip())
+    return total_us / 1000, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time budget check")
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS), help="Modules to import")
+    parser.add_argument("--budget-ms", type=float, default=150, help="Max import time per module")
+    parser.add_argument("--runs", type=int, default=5, help="Best of N fresh interpreters")
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    print(f"{'module':>18}  {'best_ms':>8}  {'budget':>8}  eager heavy imports")
+    for module in args.modules:
+        results = [measure(module) for _ in range(max(1, args.runs))]
+        best = min(ms for ms, _ in results)
+        eager: Dict[str, None] = {}
+        for _, loaded in results:
+            eager.update((m, None) for m in LAZY_MODULES if m in loaded)
+        print(f"{module:>18}  {best:>8.1f}  {args.budget_ms:>8.0f}  {', '.join(eager) or '-'}", flush=True)
+        if best > args.budget_ms:
+            failures.append(f"{module}: {best:.1f} ms > {args.budget_ms:.0f} ms")
+        if eager:
+            failures.append(f"{module}: imports {', '.join(eager)} at load time")
+    for failure in failures:
+        print(f"[importtime] {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
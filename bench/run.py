@@ -0,0 +1,218 @@
+"""Offline benchmark: scrape and store synthetic or recorded profiles against
+the local fixture server and report throughput, latency, memory and bytes.
+
+    python -m bench.run --profiles 20 --concurrency 1,4 --webp off,on
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+from bench.fixtures import FixtureServer
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class RssSampler:
+    """Peak RSS of this process and its children (Chrome, converters), sampled."""
+
+    def __init__(self, interval: float = 0.1):
+        from utils.driver_pool import _process_tree_rss
+
+        self._rss = _process_tree_rss
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while True:
+            self.peak = max(self.peak, self._rss(os.getpid()))
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_config(server: FixtureServer, config: Dict[str, Any], args) -> Dict[str, Any]:
+    from launch_and_store import store_profile
+    from scraper import create_driver, iter_instagram_profile
+    from utils.ai import AiEnricher
+    from utils.batch import run_batch
+    from utils.driver_pool import DriverPool
+
+    headers = {"Authorization": "Bearer bench", "apikey": "bench", "Content-Type": "application/json"}
+    enricher = None
+    if args.ai:
+        enricher = AiEnricher("bench", base_url=server.base_url + "/v1", requests_per_minute=args.ai_rpm)
+    pooled = config["mode"] == "pooled"
+    pool = None
+    if pooled:
+        pool = DriverPool(create_driver, size=config["concurrency"], max_idle=config["concurrency"])
+
+    def worker(job: Dict[str, Any]) -> Dict[str, Any]:
+        # Scraped posts stream into the store pipeline, as in launch_and_store.py
+        info: Dict[str, Any] = {}
+        posts = iter_instagram_profile(
+            job["username"],
+            timeout=args.timeout,
+            pool=pool,
+            engine=config["engine"],
+            block=args.block_resources,
+            info=info,
+        )
+        result: Dict[str, Any] = {"username": job["username"]}
+        if args.scrape_only:
+            for _ in posts:
+                pass
+        else:
+            stored = store_profile(
+                {"username": job["username"], "posts": posts},
+                "bench",
+                job["username"],
+                server.base_url,
+                headers,
+                run_id="bench",
+                convert_webp=config["webp"],
+                webp_preset=args.webp_preset,
+                webp_max_dim=args.webp_max_dim,
+                enricher=enricher,
+            )
+            result["added"] = stored["added"]
+            if stored["failed"]:
+                result["status"] = "partial"
+        result.update(source=info.get("source"), posts=info.get("total_posts", 0))
+        if not result["posts"]:
+            result["status"] = "error"
+            result["error"] = info.get("error") or info.get("fallback_reason") or "no posts"
+        return result
+
+    run_tag = "-".join(str(v) for v in config.values())
+    jobs = ({"username": f"bench_{run_tag}_{i}"} for i in range(args.profiles))
+    server.reset_stats()
+    latencies: List[float] = []
+    failures = 0
+    sources: Dict[str, int] = {}
+    started = time.monotonic()
+    try:
+        with RssSampler() as rss:
+            for result in run_batch(jobs, worker, config["concurrency"]):
+                latencies.append(result["elapsed_s"])
+                if result.get("status") != "ok":
+                    failures += 1
+                    if args.verbose:
+                        print(f"[bench] {result}", file=sys.stderr)
+                source = result.get("source") or "none"
+                sources[source] = sources.get(source, 0) + 1
+    finally:
+        if pool is not None:
+            pool.close()
+    elapsed = time.monotonic() - started
+    stats = dict(server.stats)
+    return {
+        **config,
+        "profiles": len(latencies),
+        "failed": failures,
+        "sources": sources,
+        "profiles_per_min": round(len(latencies) / elapsed * 60, 1) if elapsed else 0.0,
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p95_s": round(percentile(latencies, 95), 3),
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 1),
+        "sent_mb": round(stats["bytes_in"] / (1024 * 1024), 2),
+        "received_mb": round(stats["bytes_out"] / (1024 * 1024), 2),
+        "requests": stats["requests"],
+        "ai_calls": stats["ai_calls"],
+        "wall_s": round(elapsed, 2),
+    }
+
+
+def _csv(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scraper/pipeline benchmark")
+    parser.add_argument("--profiles", type=int, default=20, help="Profiles per configuration")
+    parser.add_argument("--posts", type=int, default=12, help="Posts per synthetic profile")
+    parser.add_argument("--image-size", type=int, default=1080, help="Edge of the served JPEGs (px)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added to every fixture response")
+    parser.add_argument(
+        "--fixtures",
+        default=None,
+        metavar="DIR",
+        help="Recorded web_profile_info payloads (<username>.json); synthetic profiles otherwise",
+    )
+    parser.add_argument("--engines", default="http", help="Comma-separated: http, browser")
+    parser.add_argument(
+        "--modes",
+        default="serial,pooled",
+        help="Browser engine only: serial (new Chrome per profile) and/or pooled (warm drivers)",
+    )
+    parser.add_argument("--concurrency", default="1,4", help="Comma-separated concurrency levels")
+    parser.add_argument("--webp", default="off,on", help="Comma-separated: off, on")
+    parser.add_argument("--webp-preset", default="balanced", help="WebP preset when --webp is on")
+    parser.add_argument("--webp-max-dim", type=int, default=None, help="WebP downscaling bound (px)")
+    parser.add_argument("--ai", action="store_true", help="Describe images via the stub AI endpoint")
+    parser.add_argument("--ai-rpm", type=float, default=None, help="AI requests per minute cap")
+    parser.add_argument("--scrape-only", action="store_true", help="Skip downloads/uploads/inserts")
+    parser.add_argument("--block-resources", default=None, help="Passed to the browser engine")
+    parser.add_argument("--timeout", type=int, default=30)
+    parser.add_argument("--json", default=None, metavar="PATH", help="Also write results as JSON lines")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = FixtureServer(
+        posts=args.posts,
+        image_size=args.image_size,
+        latency_ms=args.latency_ms,
+        fixtures_dir=args.fixtures,
+    ).start()
+    # Must be set before scraper/utils.instagram_api are imported
+    os.environ["IG_SCRAPER_INSTAGRAM_URL"] = server.base_url
+
+    configs = []
+    webp_levels = [False] if args.scrape_only else [v == "on" for v in _csv(args.webp)]
+    for engine in _csv(args.engines):
+        modes = _csv(args.modes) if engine == "browser" else ["serial"]
+        for mode, conc, webp in itertools.product(modes, _csv(args.concurrency), webp_levels):
+            configs.append({"engine": engine, "mode": mode, "concurrency": int(conc), "webp": webp})
+
+    out = open(args.json, "a", encoding="utf-8") if args.json else None
+    columns = ["engine", "mode", "concurrency", "webp", "profiles_per_min", "p50_s", "p95_s",
+               "peak_rss_mb", "sent_mb", "received_mb", "failed"]
+    print("  ".join(f"{c:>12}" for c in columns))
+    try:
+        for config in configs:
+            result = run_config(server, config, args)
+            print("  ".join(f"{str(result[c]):>12}" for c in columns), flush=True)
+            if out is not None:
+                out.write(json.dumps(result) + "\n")
+    finally:
+        if out is not None:
+            out.close()
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Compare WebP presets: bytes saved against CPU ms spent.
+
+    python -m bench.webp photos/*.jpg --max-dim 1440
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from bench.fixtures import make_jpeg
+from utils.webp import WEBP_PRESETS, WebpStats, convert_to_webp
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebP preset comparison")
+    parser.add_argument("images", nargs="*", help="Image files (default: synthetic JPEGs)")
+    parser.add_argument("--image-size", type=int, default=1080, help="Edge of synthetic JPEGs (px)")
+    parser.add_argument("--count", type=int, default=8, help="Number of synthetic JPEGs")
+    parser.add_argument("--max-dim", type=int, default=None, help="Downscale before encoding")
+    parser.add_argument("--presets", default=",".join(WEBP_PRESETS), help="Comma-separated presets")
+    args = parser.parse_args()
+
+    if args.images:
+        sources = []
+        for path in args.images:
+            with open(path, "rb") as f:
+                sources.append(f.read())
+    else:
+        sources = [make_jpeg(args.image_size) for _ in range(args.count)]
+
+    columns = ["preset", "converted", "skipped", "bytes_in", "bytes_out", "saved_pct", "cpu_ms", "ms_per_img",
+               "saved_kb_per_cpu_s"]
+    print("  ".join(f"{c:>18}" for c in columns))
+    for preset in args.presets.split(","):
+        stats = WebpStats()
+        for data in sources:
+            stats.add(convert_to_webp(data, preset=preset, max_dim=args.max_dim)[1])
+        row = stats.summary()[preset]
+        row["preset"] = preset
+        row["saved_pct"] = round(100 * row["bytes_saved"] / row["bytes_in"], 1) if row["bytes_in"] else 0.0
+        row["ms_per_img"] = round(row["cpu_ms"] / len(sources), 1)
+        print("  ".join(f"{str(row[c]):>18}" for c in columns), flush=True)
+
+
+if __name__ == "__main__":
+    main()
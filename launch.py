@@ -1,17 +1,155 @@
 import argparse
+import atexit
 import json
+import os
+import sys
+import threading
 
-from scraper import scrape_instagram_profile
+from scraper import create_driver, iter_instagram_profile, scrape_instagram_profile
+from utils import metrics
+from utils.batch import read_jobs, run_batch
+from utils.blocking import resolve_blocked_urls
+from utils.driver_pool import DriverPool
+from utils.proxy_pool import ProxyPool, load_proxy_list
+from utils.pagination import parse_until
+from utils.watermark import HighWaterMarks
 
 
 def main():
     parser = argparse.ArgumentParser(description="Instagram profile scraper")
-    parser.add_argument("--username", "-u", required=True, help="Instagram username")
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument("--username", "-u", help="Instagram username")
+    target_group.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Scrape many profiles: usernames or JSON lines from FILE ('-' for stdin)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Batch mode: number of profiles scraped in parallel (one driver each)",
+    )
+    parser.add_argument(
+        "--pool-max-pages",
+        type=int,
+        default=50,
+        help="Batch mode: recycle a driver after this many profiles",
+    )
+    parser.add_argument(
+        "--pool-max-rss-mb",
+        type=int,
+        default=None,
+        help="Batch mode: recycle a driver once Chrome's RSS exceeds this many MB",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only emit posts newer than the newest one seen on the previous run",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory for local state (default ~/.cache/ig-scraper)",
+    )
     parser.add_argument("--timeout", type=int, default=30, help="Timeout seconds")
     parser.add_argument(
         "--debug", action="store_true", help="Enable verbose debug and dumps"
     )
     parser.add_argument("--proxy", help="Proxy URL (http(s) or socks5), auth supported")
+    parser.add_argument(
+        "--proxy-list",
+        metavar="FILE_OR_LIST",
+        default=None,
+        help=(
+            "Pool of proxies (file with one per line, or comma-separated); '{sid}' in a URL is "
+            "replaced by a session id that rotates after failures or login walls"
+        ),
+    )
+    parser.add_argument(
+        "--proxy-strategy",
+        choices=["best", "lru"],
+        default="best",
+        help="Pick the healthiest proxy (default) or the least recently used one",
+    )
+    parser.add_argument(
+        "--extract-strategy",
+        choices=["script", "elements", "api"],
+        default="script",
+        help=(
+            "Post extraction: one in-page script call (default), per-element WebDriver calls, "
+            "or 'api' to parse Instagram's JSON responses captured via selenium-wire"
+        ),
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["auto", "http", "browser"],
+        default="auto",
+        help=(
+            "auto: fetch profile data over plain HTTP and launch Chrome only on a login wall "
+            "or parse failure (default); http: never launch Chrome; browser: always use Chrome"
+        ),
+    )
+    parser.add_argument(
+        "--max-posts",
+        type=int,
+        default=None,
+        help="Scroll the profile until this many posts are collected",
+    )
+    parser.add_argument(
+        "--until",
+        type=parse_until,
+        default=None,
+        metavar="DATE",
+        help="Stop at posts older than DATE (YYYY-MM-DD, UTC); needs timestamps (api strategy)",
+    )
+    parser.add_argument(
+        "--max-scrolls",
+        type=int,
+        default=50,
+        help="Upper bound on scroll rounds when paginating",
+    )
+    parser.add_argument(
+        "--block-resources",
+        default=None,
+        metavar="PRESET",
+        help=(
+            "Block requests while loading the profile: 'full' (block nothing, default), "
+            "'no-media', 'data-only', or comma-separated URL patterns"
+        ),
+    )
+    session_group = parser.add_mutually_exclusive_group()
+    session_group.add_argument(
+        "--record",
+        metavar="DIR",
+        help="Save each profile's full browser network exchange to DIR/<username>.har (implies --engine browser)",
+    )
+    session_group.add_argument(
+        "--replay",
+        metavar="DIR",
+        help="Serve DIR/<username>.har back to the browser instead of using the network",
+    )
+    parser.add_argument(
+        "--metrics-jsonl",
+        default=None,
+        metavar="PATH",
+        help="Append one JSON line per timed stage (driver start, navigation, downloads, ...) to PATH",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        default=None,
+        metavar="PATH",
+        help="Write aggregated timings and byte/retry counters to PATH in Prometheus text format",
+    )
+    parser.add_argument(
+        "--output",
+        choices=["json", "ndjson"],
+        default="json",
+        help=(
+            "json: one document per profile once it is done (default); ndjson: one line per post "
+            "as soon as it is extracted ({\"type\": \"post\", ...}), then a {\"type\": \"profile\"} summary"
+        ),
+    )
     headless_group = parser.add_mutually_exclusive_group()
     headless_group.add_argument(
         "--headless",
@@ -27,15 +165,87 @@ def main():
     )
     parser.set_defaults(headless=True)
     args = parser.parse_args()
+    try:
+        resolve_blocked_urls(args.block_resources)
+    except ValueError as e:
+        parser.error(str(e))
+    if (args.record or args.replay) and args.engine == "http":
+        parser.error("--record/--replay need the browser engine")
+    atexit.register(metrics.configure(args.metrics_jsonl, args.metrics_prom).close)
 
-    data = scrape_instagram_profile(
-        args.username,
-        headless=args.headless,
-        timeout=args.timeout,
-        debug=args.debug,
-        proxy=args.proxy,
-    )
-    print(json.dumps(data, indent=2, ensure_ascii=False))
+    proxy_pool = None
+    if args.proxy_list:
+        proxy_pool = ProxyPool(
+            load_proxy_list(args.proxy_list), strategy=args.proxy_strategy, debug=args.debug
+        )
+    marks = HighWaterMarks(cache_dir=args.cache_dir) if args.incremental else None
+
+    write_lock = threading.Lock()
+
+    def write(value, indent=None):
+        # One write per line so concurrent batch profiles never interleave mid-line
+        line = json.dumps(value, indent=indent, ensure_ascii=False) + "\n"
+        with write_lock:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+
+    def scrape(username, proxy, pool=None):
+        kwargs = dict(
+            headless=args.headless,
+            timeout=args.timeout,
+            debug=args.debug,
+            proxy=proxy,
+            pool=pool,
+            strategy=args.extract_strategy,
+            block=args.block_resources,
+            since=marks.get(username) if marks else None,
+            max_posts=args.max_posts,
+            until=args.until,
+            max_scrolls=args.max_scrolls,
+            proxy_pool=proxy_pool,
+            engine=args.engine,
+            record=os.path.join(args.record, f"{username}.har") if args.record else None,
+            replay=os.path.join(args.replay, f"{username}.har") if args.replay else None,
+        )
+        with metrics.span("profile", username=username) as span:
+            if args.output == "ndjson":
+                info = {}
+                for post in iter_instagram_profile(username, info=info, **kwargs):
+                    write({"type": "post", "username": username, **post})
+                newest = info.pop("newest")
+                data = {"type": "profile", "username": username, **info}
+            else:
+                data = scrape_instagram_profile(username, **kwargs)
+                newest = None
+            span.update(source=data.get("source"), posts=data.get("total_posts"))
+        metrics.get_metrics().flush()
+        if data.get("error"):
+            # A scrape cut short keeps its partial posts; the mark stays put so
+            # the next incremental run fetches the rest
+            data["status"] = "partial"
+        elif marks:
+            marks.advance(username, [newest] if newest else data.get("posts", []))
+        return data
+
+    if args.batch:
+        with DriverPool(
+            create_driver,
+            size=args.concurrency,
+            max_pages=args.pool_max_pages,
+            max_rss_mb=args.pool_max_rss_mb,
+            max_idle=args.concurrency,
+            debug=args.debug,
+        ) as pool:
+
+            def worker(job):
+                return scrape(job["username"], job.get("proxy") or args.proxy, pool)
+
+            for result in run_batch(read_jobs(args.batch), worker, args.concurrency):
+                write(result)
+        return
+
+    data = scrape(args.username, args.proxy)
+    write(data, indent=None if args.output == "ndjson" else 2)
 
 
 if __name__ == "__main__":
@@ -1,16 +1,33 @@
 import argparse
+import atexit
+import functools
 import hashlib
 import json
 import mimetypes
 import os
 import sys
-from typing import Any, Dict, List, Tuple
-import base64
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 from urllib.parse import urlparse
 import uuid
-from io import BytesIO
 
-from scraper import scrape_instagram_profile
+from scraper import create_driver, iter_instagram_profile
+from utils.batch import read_jobs, run_batch
+from utils import metrics
+from utils.ai import AiCache, AiEnricher
+from utils.blocking import resolve_blocked_urls
+from utils.cache import UrlCache
+from utils.dedupe import HashIndex
+from utils.driver_pool import DriverPool
+from utils.proxy_pool import ProxyPool, load_proxy_list
+from utils.pagination import parse_until
+from utils.http import HttpError, configure as configure_http, get_client
+from utils.journal import DONE_STATES, RunJournal
+from utils.pipeline import Stage, get_process_pool, run_pipeline
+from utils.spool import DEFAULT_MAX_MEMORY, SpooledBody, spool_response
+from utils.watermark import HighWaterMarks
+from utils.webp import DEFAULT_PRESET, WEBP_PRESETS, WebpStats, convert_to_webp
 
 
 def _require_env(name: str) -> str:
@@ -40,61 +57,66 @@ def upload_to_storage(
     headers: Dict[str, str],
     bucket: str,
     object_name: str,
-    content_bytes: bytes,
+    content_bytes: bytes | SpooledBody,
     content_type: str = "application/octet-stream",
 ) -> Dict[str, Any]:
-    try:
-        import requests  # type: ignore
-    except ImportError:
-        print(
-            "The 'requests' package is required. Please install dependencies.",
-            file=sys.stderr,
-        )
-        sys.exit(2)
-
+    """Upload bytes, or stream a ``SpooledBody`` without loading it whole."""
     object_name = object_name.lstrip("/")
     url = base_url.rstrip("/") + f"/storage/v1/object/{bucket}/{object_name}"
     hdrs = dict(headers)
     hdrs["Content-Type"] = content_type
+    hdrs["Content-Length"] = str(len(content_bytes))
     hdrs["x-upsert"] = "true"
-    resp = requests.post(url, headers=hdrs, data=content_bytes, timeout=120)
-    if resp.status_code not in (200, 201, 204):
-        print(
-            f"Failed to upload to storage {bucket}/{object_name}: {resp.status_code} {resp.text}",
-            file=sys.stderr,
-        )
-        sys.exit(1)
+    resp = get_client().post(
+        url, headers=hdrs, data=content_bytes, ok=(200, 201, 204)
+    )
     try:
         return resp.json()
     except ValueError:
         return {"status": "uploaded"}
 
 
+def list_storage_objects(
+    base_url: str,
+    headers: Dict[str, str],
+    bucket: str,
+    prefix: str,
+    page_size: int = 1000,
+) -> Iterator[str]:
+    """Yield full object names under ``prefix`` (one folder level, as Supabase lists)."""
+    url = base_url.rstrip("/") + f"/storage/v1/object/list/{bucket}"
+    prefix = prefix.strip("/")
+    hdrs = dict(headers)
+    hdrs["Content-Type"] = "application/json"
+    offset = 0
+    while True:
+        body = {
+            "prefix": prefix,
+            "limit": page_size,
+            "offset": offset,
+            "sortBy": {"column": "name", "order": "asc"},
+        }
+        resp = get_client().post(url, headers=hdrs, data=json.dumps(body))
+        entries = resp.json() or []
+        for entry in entries:
+            # Folders come back without an id
+            if entry.get("id") and entry.get("name"):
+                yield f"{prefix}/{entry['name']}"
+        if len(entries) < page_size:
+            return
+        offset += page_size
+
+
 def insert_asset_row(
     base_url: str,
     headers: Dict[str, str],
     row: Dict[str, Any],
 ) -> Dict[str, Any]:
-    try:
-        import requests  # type: ignore
-    except ImportError:
-        print(
-            "The 'requests' package is required. Please install dependencies.",
-            file=sys.stderr,
-        )
-        sys.exit(2)
-
     url = base_url.rstrip("/") + "/rest/v1/assets"
     hdrs = dict(headers)
     hdrs.setdefault("Content-Type", "application/json")
     hdrs.setdefault("Accept", "application/json")
-    resp = requests.post(url, headers=hdrs, data=json.dumps(row), timeout=60)
-    if resp.status_code not in (200, 201):
-        print(
-            f"Failed to insert assets row: {resp.status_code} {resp.text}",
-            file=sys.stderr,
-        )
-        sys.exit(1)
+    resp = get_client().post(url, headers=hdrs, data=json.dumps(row), ok=(200, 201))
     return (
         resp.json()[0]
         if resp.headers.get("Content-Range") or resp.text.startswith("[")
@@ -102,6 +124,114 @@ def insert_asset_row(
     )
 
 
+def insert_asset_rows(
+    base_url: str,
+    headers: Dict[str, str],
+    rows: List[Dict[str, Any]],
+    upsert: bool = False,
+) -> List[Dict[str, Any]]:
+    """Insert many rows in one request; with ``upsert`` reruns update
+    existing ``(project_id, filename)`` rows instead of duplicating them."""
+    url = base_url.rstrip("/") + "/rest/v1/assets"
+    hdrs = dict(headers)
+    hdrs.setdefault("Content-Type", "application/json")
+    hdrs.setdefault("Accept", "application/json")
+    params = None
+    if upsert:
+        hdrs["Prefer"] = "return=representation,resolution=merge-duplicates"
+        params = {"on_conflict": "project_id,filename"}
+    resp = get_client().post(
+        url, headers=hdrs, data=json.dumps(rows), params=params, ok=(200, 201)
+    )
+    result = resp.json()
+    return result if isinstance(result, list) else [result]
+
+
+class AssetRowBuffer:
+    """Buffers assets rows and inserts them in batches.
+
+    A batch is sent once ``batch_size`` rows are pending or the oldest pending
+    row is ``max_delay`` seconds old. Each row is added with a key; after
+    ``close()``, ``results`` maps keys to the inserted rows (with their ``id``)
+    and ``errors`` maps keys of rows whose batch failed to the exception.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        batch_size: int = 50,
+        max_delay: float = 2.0,
+        upsert: bool = False,
+    ):
+        self.base_url = base_url
+        self.headers = headers
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.upsert = upsert
+        self.results: Dict[Any, Dict[str, Any]] = {}
+        self.errors: Dict[Any, BaseException] = {}
+        self._pending: List[Tuple[Any, Dict[str, Any]]] = []
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._timer = threading.Thread(target=self._flush_on_timer, daemon=True)
+        self._timer.start()
+
+    def add(self, key: Any, row: Dict[str, Any]) -> None:
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((key, row))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def _flush_on_timer(self) -> None:
+        while not self._stop.wait(min(self.max_delay, 0.5)):
+            with self._lock:
+                due = self._pending and time.monotonic() - self._oldest >= self.max_delay
+            if due:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._send_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            rows = [row for _, row in batch]
+            if self.upsert:
+                # PostgREST rejects an upsert touching the same key twice in one statement
+                rows = list({row["filename"]: row for row in rows}.values())
+            try:
+                with metrics.span("insert", rows=len(rows)):
+                    inserted = insert_asset_rows(
+                        self.base_url,
+                        self.headers,
+                        rows,
+                        upsert=self.upsert,
+                    )
+            except (Exception, SystemExit) as e:
+                for key, _ in batch:
+                    self.errors[key] = e
+                return
+            if not self.upsert and len(inserted) == len(batch):
+                # Plain inserts come back in request order, one row per post
+                for (key, row), returned_row in zip(batch, inserted):
+                    self.results[key] = returned_row if isinstance(returned_row, dict) else row
+                return
+            returned = {r.get("filename"): r for r in inserted if isinstance(r, dict)}
+            for key, row in batch:
+                self.results[key] = returned.get(row["filename"], row)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._timer.join()
+        self.flush()
+
+
 def guess_extension(content_type: str | None, source_url: str) -> str:
     if content_type:
         ext = mimetypes.guess_extension(content_type.split(";")[0].strip())
@@ -116,44 +246,63 @@ def guess_extension(content_type: str | None, source_url: str) -> str:
     return ".jpg"
 
 
-def download_bytes(url: str) -> Tuple[bytes, str]:
-    try:
-        import requests  # type: ignore
-    except ImportError:
-        print(
-            "The 'requests' package is required. Please install dependencies.",
-            file=sys.stderr,
-        )
-        sys.exit(2)
+def fetch_image(
+    url: str,
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> Tuple[bytes | None, str, Dict[str, Any]]:
+    """GET an image, conditionally when validators are given.
+
+    Returns ``(content, content_type, validators)``; ``content`` is None when
+    the server answered 304 Not Modified.
+    """
+    body, ctype, validators = fetch_image_spooled(url, etag, last_modified)
+    if body is None:
+        return None, ctype, validators
+    with body:
+        return body.getvalue(), ctype, validators
 
+
+def fetch_image_spooled(
+    url: str,
+    etag: str | None = None,
+    last_modified: str | None = None,
+    max_memory: int = DEFAULT_MAX_MEMORY,
+) -> Tuple[SpooledBody | None, str, Dict[str, Any]]:
+    """Like ``fetch_image``, but streams the body into a ``SpooledBody``
+    (hashed on the way in, in a temp file beyond ``max_memory`` bytes)."""
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         "Referer": "https://www.instagram.com/",
         "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
     }
-    resp = requests.get(url, headers=headers, timeout=60)
-    if resp.status_code != 200:
-        print(f"Failed to download image: {resp.status_code} {url}", file=sys.stderr)
-        sys.exit(1)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    resp = get_client().get(url, headers=headers, ok=(200, 304), stream=True)
     ctype = resp.headers.get("Content-Type", "image/jpeg")
-    return resp.content, ctype
+    validators = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+    }
+    if resp.status_code == 304:
+        resp.close()
+        return None, ctype, validators
+    body = spool_response(resp, max_memory)
+    validators["size"] = body.size
+    return body, ctype, validators
 
 
-def convert_image_to_webp(image_bytes: bytes) -> bytes:
-    try:
-        import importlib
+def download_bytes(url: str) -> Tuple[bytes, str]:
+    content, ctype, _ = fetch_image(url)
+    return content, ctype
 
-        pil_image = importlib.import_module("PIL.Image")
-    except ImportError:
-        print(
-            "Pillow is required for --convert-webp. Please install dependencies.",
-            file=sys.stderr,
-        )
-        sys.exit(2)
-    img = pil_image.open(BytesIO(image_bytes))
-    out = BytesIO()
-    img.save(out, format="WEBP", quality=85, method=6)
-    return out.getvalue()
+
+def convert_image_to_webp(
+    image_bytes: bytes, preset: str = DEFAULT_PRESET, max_dim: int | None = None
+) -> bytes:
+    return convert_to_webp(image_bytes, preset=preset, max_dim=max_dim)[0]
 
 
 def derive_object_name(project_id: str, sha1: str, ext: str) -> str:
@@ -167,67 +316,340 @@ def ai_generate_title_description(
     api_key: str,
     model: str,
 ) -> Tuple[str, str]:
-    try:
-        import importlib
+    return AiEnricher(api_key, model).describe(image_bytes, image_mime, caption_text)
 
-        openai_mod = importlib.import_module("openai")
-        OpenAI = getattr(openai_mod, "OpenAI")
-    except Exception:
-        print("The 'openai' package is required for AI generation.", file=sys.stderr)
-        sys.exit(2)
 
-    client = OpenAI(api_key=api_key)
-    b64 = base64.b64encode(image_bytes).decode("ascii")
-    data_url = f"data:{image_mime};base64,{b64}"
+def serialize_items(items: List[Dict[str, Any]]) -> bytes:
+    return json.dumps(items, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
-    system_prompt = (
-        "You generate concise, human-friendly metadata for images. "
-        "Return strict JSON with keys 'title' and 'description'. The title is 1-5 words. "
-        "The description is one short sentence (<= 20 words)."
-    )
 
-    try:
-        resp = client.chat.completions.create(
-            model=model,
-            response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": f"Instagram caption: {caption_text or ''}",
-                        },
-                        {"type": "image_url", "image_url": {"url": data_url}},
-                    ],
-                },
-            ],
+def _convert_item(options: Dict[str, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+    # Module-level so it can run in the conversion process pool; the timing
+    # travels back with the item since metrics live in the parent process
+    if item.get("uploaded"):
+        return item
+    started = time.perf_counter()
+    item["content"], stats = convert_to_webp(item["content"], **options)
+    stats["wall_s"] = time.perf_counter() - started
+    item["webp"] = stats
+    if stats["converted"]:
+        item["content_type"] = "image/webp"
+        item["ext"] = ".webp"
+    return item
+
+
+# Per-job overrides accepted from batch lines and queued worker jobs
+JOB_OPTIONS = (
+    "extract_strategy",
+    "max_posts",
+    "max_scrolls",
+    "engine",
+    "convert_webp",
+    "webp_preset",
+    "webp_max_dim",
+)
+
+DEFAULT_WORKERS = {"download": 4, "convert": 1, "upload": 4, "ai": 2}
+
+
+def store_profile(
+    data: Dict[str, Any],
+    project_id: str,
+    username: str,
+    base_url: str,
+    headers: Dict[str, str],
+    run_id: str,
+    convert_webp: bool = False,
+    webp_preset: str = DEFAULT_PRESET,
+    webp_max_dim: int | None = None,
+    webp_min_bytes: int = 0,
+    webp_keep_original: bool = False,
+    openai_api_key: str | None = None,
+    openai_model: str = "gpt-4o-mini",
+    workers: Dict[str, int] | None = None,
+    queue_size: int = 8,
+    insert_batch_size: int = 50,
+    insert_flush_seconds: float = 2.0,
+    upsert: bool = False,
+    index: HashIndex | None = None,
+    url_cache: UrlCache | None = None,
+    url_cache_mode: str = "trust",
+    enricher: AiEnricher | None = None,
+    spool_max_memory: int = DEFAULT_MAX_MEMORY,
+    journal: RunJournal | None = None,
+) -> Dict[str, Any]:
+    """Download, (convert,) upload, (describe,) and insert every post.
+
+    ``data["posts"]`` may be any iterable, e.g. an ``iter_instagram_profile``
+    generator, so downloads start while the scrape is still paginating.
+    Posts stream through a staged pipeline with a bounded queue and its own
+    concurrency limit per stage; WebP encoding runs in a process pool.
+    Rows are inserted in batches; each post gets the ``asset_id`` of its row.
+    With an ``index``, images already stored for the project are skipped;
+    a ``url_cache`` lets them be skipped before downloading, either trusting
+    the cached URL ("trust") or after a conditional GET ("revalidate").
+    Titles/descriptions come from ``enricher`` (or a plain one built from
+    ``openai_api_key``). Downloads are hashed while streaming and kept in
+    memory up to ``spool_max_memory`` bytes each, in a temp file beyond that;
+    uploads stream from there.
+    With a ``journal``, each post's progress is recorded under ``run_id``;
+    posts already inserted (or skipped) by an earlier attempt are left out
+    and uploaded ones only get their row inserted.
+    Returns ``{"added": n, "skipped": k, "failed": m, "errors": [...]}``
+    (plus ``"resumed"`` with a journal).
+    """
+    limits = dict(DEFAULT_WORKERS)
+    limits.update(workers or {})
+    if enricher is None and openai_api_key:
+        enricher = AiEnricher(openai_api_key, openai_model)
+
+    webp_options = {
+        "preset": webp_preset,
+        "max_dim": webp_max_dim,
+        "min_bytes": webp_min_bytes,
+        "keep_original": webp_keep_original,
+    }
+    webp_stats = WebpStats()
+    # The URL cache maps a source to what it produced, which depends on the encoder settings
+    variant = "raw"
+    if convert_webp:
+        variant = f"webp:{webp_preset}:{webp_max_dim or 0}:{webp_min_bytes}"
+        if webp_keep_original:
+            variant += ":keep"
+
+    def journal_post(post: Dict[str, Any], **fields) -> None:
+        if journal is not None:
+            journal.update_post(run_id, username, post, **fields)
+
+    def uploaded(item: Dict[str, Any]) -> Dict[str, Any]:
+        # Recorded after the last stage before the insert, so a resume has all the row needs
+        journal_post(
+            item["post"],
+            state="uploaded",
+            object_name=item["object_name"],
+            sha1=item["sha1"],
+            title=item.get("title"),
+            description=item.get("description"),
         )
-        content = resp.choices[0].message.content or "{}"
-        data = json.loads(content)
-        title = str(data.get("title") or "").strip()
-        description = str(data.get("description") or "").strip()
-        if not title:
-            title = (caption_text or "Instagram image").strip()[:60]
-        if not description:
-            description = (caption_text or "").strip().split("\n")[0][:160]
-        return title, description
-    except Exception as e:
-        print(f"[AI] Generation failed, falling back to caption: {e}", file=sys.stderr)
-        title = (caption_text or "Instagram image").strip()[:60]
-        description = (caption_text or "").strip().split("\n")[0][:160]
-        return title, description
+        return item
 
+    def download(item: Dict[str, Any]) -> Dict[str, Any]:
+        if item.get("uploaded"):
+            return item
+        with metrics.span("download", username=username) as span:
+            item = _download(item)
+            span["bytes"] = len(item["body"]) if item else 0
+            span["cached"] = item is None
+        if item is None:
+            return None
+        metrics.count("bytes_downloaded", len(item["body"]))
+        if convert_webp:
+            # The encoder (in another process) needs the whole image anyway
+            with item.pop("body") as body:
+                item["content"] = body.getvalue()
+        return item
 
-def serialize_items(items: List[Dict[str, Any]]) -> bytes:
-    return json.dumps(items, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    def _download(item: Dict[str, Any]) -> Dict[str, Any]:
+        img_url = item["post"]["img_src"]
+        cached = url_cache.get(img_url, variant) if url_cache is not None else None
+        if cached and index is not None:
+            object_name = derive_object_name(project_id, cached["sha1"], cached["ext"])
+            if index.has(project_id, object_name):
+                item["object_name"] = object_name
+                if url_cache_mode == "trust":
+                    return None
+                # Revalidate: a 304 means the stored object is still current
+                body, ctype, validators = fetch_image_spooled(
+                    img_url, cached.get("etag"), cached.get("last_modified"), spool_max_memory
+                )
+                if body is None:
+                    return None
+                item["body"], item["content_type"], item["validators"] = body, ctype, validators
+                item["ext"] = guess_extension(ctype, img_url)
+                return item
+        item["body"], item["content_type"], item["validators"] = fetch_image_spooled(
+            img_url, max_memory=spool_max_memory
+        )
+        item["ext"] = guess_extension(item["content_type"], img_url)
+        return item
 
+    def upload(item: Dict[str, Any]) -> Dict[str, Any]:
+        if item.get("uploaded"):
+            return item
+        if "webp" in item:
+            stats = item.pop("webp")
+            webp_stats.add(stats)
+            metrics.observe(
+                "convert",
+                stats.pop("wall_s"),
+                username=username,
+                **stats,
+            )
+        # Derive stable filename from content hash and extension; spooled
+        # downloads were hashed chunk by chunk as they arrived
+        if "body" in item:
+            payload = item["body"]
+            item["sha1"] = payload.sha1
+        else:
+            payload = item["content"]
+            item["sha1"] = hashlib.sha1(payload).hexdigest()
+        sha1 = item["sha1"][:16]
+        item["object_name"] = derive_object_name(project_id, sha1, item["ext"])
+        if url_cache is not None:
+            url_cache.put(
+                item["post"]["img_src"],
+                variant,
+                sha1,
+                item["ext"],
+                content_type=item["content_type"],
+                **item.get("validators", {}),
+            )
+        if index is not None and index.has(project_id, item["object_name"]):
+            # Same bytes already uploaded and recorded: nothing left to do
+            return None
+        with metrics.span("upload", username=username, bytes=len(payload)):
+            upload_to_storage(
+                base_url,
+                headers,
+                "assets",
+                item["object_name"],
+                payload,
+                content_type=item["content_type"],
+            )
+        metrics.count("bytes_uploaded", len(payload))
+        return item if enricher is not None else uploaded(item)
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Scrape Instagram and upload images to assets bucket; insert rows into assets table"
+    def describe(item: Dict[str, Any]) -> Dict[str, Any]:
+        if item.get("uploaded"):
+            return item
+        caption = item["post"].get("img_caption") or ""
+        with metrics.span("ai", username=username, model=enricher.model):
+            item["title"], item["description"] = enricher.describe(
+                item["body"].getvalue() if "body" in item else item["content"],
+                item["content_type"],
+                caption,
+                image_sha1=item["sha1"],
+            )
+        return uploaded(item)
+
+    stages = [Stage("download", download, limits["download"])]
+    if convert_webp:
+        stages.append(
+            Stage(
+                "convert",
+                functools.partial(_convert_item, webp_options),
+                limits["convert"],
+                processes=True,
+            )
+        )
+    stages.append(Stage("upload", upload, limits["upload"]))
+    if enricher is not None:
+        stages.append(Stage("ai", describe, limits["ai"]))
+
+    def row_for(item: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "project_id": project_id,
+            "filename": item["object_name"],
+            "type": "image",
+            "metadata": {
+                "source": "instagram",
+                "instagram": username,
+                "run_id": run_id,
+            },
+            "title": item.get("title"),
+            "description": item.get("description", item["post"].get("img_caption") or ""),
+        }
+
+    errors: List[Dict[str, Any]] = []
+
+    def record_error(stage: str, post: Dict[str, Any], error: BaseException) -> None:
+        print(
+            f"[store] {stage} failed for {post.get('img_src')}: {error!r}",
+            file=sys.stderr,
+        )
+        errors.append({"stage": stage, "img_src": post.get("img_src"), "error": repr(error)})
+
+    resumed = 0
+
+    def source() -> Iterator[Dict[str, Any]]:
+        nonlocal resumed
+        for post in data.get("posts", []):
+            if not post.get("img_src"):
+                continue
+            if journal is None:
+                yield {"post": post}
+                continue
+            record = journal.add_post(run_id, username, post)
+            if record["state"] in DONE_STATES:
+                resumed += 1
+                continue
+            if record["state"] == "uploaded":
+                # Already in Storage: straight to the insert
+                resumed += 1
+                item = {"post": post, "uploaded": True, "object_name": record["object_name"]}
+                item["sha1"] = record["sha1"]
+                if record["title"] is not None:
+                    item["title"], item["description"] = record["title"], record["description"]
+                yield item
+                continue
+            yield {"post": post}
+    buffer = AssetRowBuffer(
+        base_url,
+        headers,
+        batch_size=insert_batch_size,
+        max_delay=insert_flush_seconds,
+        upsert=upsert,
     )
+    stored: Dict[int, Dict[str, Any]] = {}
+    skipped = 0
+    try:
+        # One encoder pool per process, so --convert-workers bounds encoding
+        # across every profile in batch and worker mode
+        executor = get_process_pool(limits["convert"]) if convert_webp else None
+        for item in run_pipeline(source(), stages, queue_size=queue_size, executor=executor):
+            if item.value is not None:
+                # Release the image (memory or temp file) as soon as the post is done with
+                item.value.pop("content", None)
+                body = item.value.pop("body", None)
+                if body is not None:
+                    body.close()
+            if not item.ok:
+                record_error(item.stage, item.value["post"] if item.value else {}, item.error)
+                if item.value is not None:
+                    journal_post(item.value["post"], error=f"{item.stage}: {item.error!r}")
+                continue
+            if item.stage is not None:
+                skipped += 1
+                journal_post(item.value["post"], state="skipped")
+                continue
+            stored[item.index] = item.value
+            buffer.add(item.index, row_for(item.value))
+    finally:
+        buffer.close()
+
+    added = 0
+    inserted_names = []
+    for key, item in stored.items():
+        if key in buffer.errors:
+            record_error("insert", item["post"], buffer.errors[key])
+            journal_post(item["post"], error=f"insert: {buffer.errors[key]!r}")
+            continue
+        item["post"]["asset_id"] = buffer.results[key].get("id")
+        journal_post(item["post"], state="inserted", asset_id=item["post"]["asset_id"], error=None)
+        inserted_names.append(item["object_name"])
+        added += 1
+    if index is not None and inserted_names:
+        index.add(project_id, inserted_names)
+    result = {"added": added, "skipped": skipped, "failed": len(errors), "errors": errors}
+    if journal is not None:
+        result["resumed"] = resumed
+    if convert_webp:
+        result["webp"] = webp_stats.summary()
+    return result
+
+
+def add_store_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options shared by the one-shot CLI and the worker service."""
     parser.add_argument(
         "--file-name",
         required=False,
@@ -237,23 +659,208 @@ def main():
     parser.add_argument(
         "--project-id",
         "-p",
-        required=True,
-        help="Project UUID to set on inserted assets rows",
+        required=False,
+        default=None,
+        help="Project UUID to set on inserted assets rows (batch lines may override)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Batch mode: number of profiles processed in parallel (one driver each)",
+    )
+    parser.add_argument(
+        "--pool-max-pages",
+        type=int,
+        default=50,
+        help="Batch mode: recycle a driver after this many profiles",
+    )
+    parser.add_argument(
+        "--pool-max-rss-mb",
+        type=int,
+        default=None,
+        help="Batch mode: recycle a driver once Chrome's RSS exceeds this many MB",
     )
-    parser.add_argument("--username", "-u", required=True, help="Instagram username")
     parser.add_argument("--timeout", type=int, default=30)
     parser.add_argument("--debug", action="store_true")
     parser.add_argument("--proxy", help="Proxy URL (http(s) or socks5), auth supported")
+    parser.add_argument(
+        "--proxy-list",
+        metavar="FILE_OR_LIST",
+        default=None,
+        help=(
+            "Pool of proxies (file with one per line, or comma-separated); '{sid}' in a URL is "
+            "replaced by a session id that rotates after failures or login walls"
+        ),
+    )
+    parser.add_argument(
+        "--proxy-strategy",
+        choices=["best", "lru"],
+        default="best",
+        help="Pick the healthiest proxy (default) or the least recently used one",
+    )
+    parser.add_argument(
+        "--extract-strategy",
+        choices=["script", "elements", "api"],
+        default="script",
+        help=(
+            "Post extraction: one in-page script call (default), per-element WebDriver calls, "
+            "or 'api' to parse Instagram's JSON responses captured via selenium-wire"
+        ),
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["auto", "http", "browser"],
+        default="auto",
+        help=(
+            "auto: fetch profile data over plain HTTP and launch Chrome only on a login wall "
+            "or parse failure (default); http: never launch Chrome; browser: always use Chrome"
+        ),
+    )
     parser.add_argument(
         "--convert-webp",
         action="store_true",
         help="Convert downloaded images to WebP before upload",
     )
+    parser.add_argument(
+        "--webp-preset",
+        choices=sorted(WEBP_PRESETS),
+        default=DEFAULT_PRESET,
+        help=f"WebP encoder speed/size trade-off (default {DEFAULT_PRESET}, i.e. quality=85, method=6)",
+    )
+    parser.add_argument(
+        "--webp-max-dim",
+        type=int,
+        default=None,
+        help="Downscale images so the longest edge is at most this many pixels before encoding",
+    )
+    parser.add_argument(
+        "--webp-min-bytes",
+        type=int,
+        default=0,
+        help="Upload sources smaller than this as-is instead of converting them",
+    )
+    parser.add_argument(
+        "--webp-keep-original",
+        action="store_true",
+        help="Upload the source as-is when it is already WebP or the WebP would not be smaller",
+    )
+    for stage, help_text in (
+        ("download", "Parallel image downloads per profile"),
+        ("upload", "Parallel storage uploads per profile"),
+        ("ai", "Parallel AI title/description requests per profile"),
+    ):
+        parser.add_argument(
+            f"--{stage}-concurrency",
+            type=int,
+            default=DEFAULT_WORKERS[stage],
+            help=f"{help_text} (default {DEFAULT_WORKERS[stage]})",
+        )
+    parser.add_argument(
+        "--convert-workers",
+        type=int,
+        default=DEFAULT_WORKERS["convert"],
+        help="Processes used for WebP conversion (default 1)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=8,
+        help="Bounded queue length between pipeline stages",
+    )
+    parser.add_argument(
+        "--spool-max-kb",
+        type=int,
+        default=DEFAULT_MAX_MEMORY // 1024,
+        help="Per-image download buffer kept in memory; larger files spill to a temp file",
+    )
+    parser.add_argument(
+        "--insert-batch-size",
+        type=int,
+        default=50,
+        help="Assets rows sent per insert request",
+    )
+    parser.add_argument(
+        "--insert-flush-seconds",
+        type=float,
+        default=2.0,
+        help="Send buffered assets rows at least this often",
+    )
+    parser.add_argument(
+        "--upsert",
+        action="store_true",
+        help="Upsert assets rows on (project_id, filename); needs a unique constraint on those columns",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only process posts newer than the newest one stored on the previous run",
+    )
+    parser.add_argument(
+        "--no-dedupe",
+        dest="dedupe",
+        action="store_false",
+        help="Upload and insert every image even if the same content is already stored",
+    )
+    parser.add_argument(
+        "--refresh-dedupe-index",
+        action="store_true",
+        help="Rebuild the local dedupe index from a listing of the storage bucket",
+    )
+    parser.add_argument(
+        "--url-cache",
+        choices=["trust", "revalidate", "off"],
+        default="trust",
+        help=(
+            "Skip downloading images whose CDN path produced an already stored object: "
+            "'trust' the cache, 'revalidate' with a conditional GET, or 'off'"
+        ),
+    )
+    parser.add_argument(
+        "--url-cache-size",
+        type=int,
+        default=100_000,
+        help="Maximum URL cache entries (least recently used are evicted)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory for local caches and indexes (default ~/.cache/ig-scraper)",
+    )
+    parser.add_argument(
+        "--http-pool-size",
+        type=int,
+        default=10,
+        help="Keep-alive connections kept per host for downloads and Supabase calls",
+    )
+    parser.add_argument(
+        "--http-timeout", type=float, default=60, help="HTTP timeout in seconds"
+    )
+    parser.add_argument(
+        "--http-retries",
+        type=int,
+        default=3,
+        help="Retries with exponential backoff on 429/5xx and connection errors",
+    )
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Use HTTP/2 (requires httpx[http2]); falls back to HTTP/1.1 keep-alive",
+    )
     parser.add_argument(
         "--run-id",
         required=False,
         default=None,
-        help="Optional UUID to tag this run; generated if omitted",
+        help=(
+            "Optional UUID to tag this run; generated if omitted. Rerunning with the same id resumes it: "
+            "the recorded scrape is reused and only unfinished posts are processed"
+        ),
+    )
+    parser.add_argument(
+        "--no-journal",
+        dest="journal",
+        action="store_false",
+        help="Don't record run progress (runs.sqlite in the cache dir), so a rerun starts over",
     )
     parser.add_argument(
         "--openai-api-key",
@@ -267,6 +874,29 @@ def main():
         default="gpt-4o-mini",
         help="OpenAI model to use for image+caption to title/description",
     )
+    parser.add_argument(
+        "--openai-base-url",
+        default=os.getenv("OPENAI_BASE_URL"),
+        help="OpenAI-compatible API endpoint (e.g. a local stub); env OPENAI_BASE_URL",
+    )
+    parser.add_argument(
+        "--ai-rpm",
+        type=float,
+        default=None,
+        help="Cap AI requests per minute across all workers",
+    )
+    parser.add_argument(
+        "--ai-max-image-px",
+        type=int,
+        default=512,
+        help="Downscale images to this edge length before sending them to the model",
+    )
+    parser.add_argument(
+        "--no-ai-cache",
+        dest="ai_cache",
+        action="store_false",
+        help="Always call the model instead of reusing titles cached by image, caption and model",
+    )
     parser.add_argument(
         "--supabase-url",
         required=False,
@@ -279,95 +909,269 @@ def main():
         default=None,
         help="Override SUPABASE_SERVICE_ROLE environment variable",
     )
+    parser.add_argument(
+        "--max-posts",
+        type=int,
+        default=None,
+        help="Scroll the profile until this many posts are collected",
+    )
+    parser.add_argument(
+        "--until",
+        type=parse_until,
+        default=None,
+        metavar="DATE",
+        help="Stop at posts older than DATE (YYYY-MM-DD, UTC); needs timestamps (api strategy)",
+    )
+    parser.add_argument(
+        "--max-scrolls",
+        type=int,
+        default=50,
+        help="Upper bound on scroll rounds when paginating",
+    )
+    parser.add_argument(
+        "--block-resources",
+        default=None,
+        metavar="PRESET",
+        help=(
+            "Block requests while loading the profile: 'full' (block nothing, default), "
+            "'no-media', 'data-only', or comma-separated URL patterns"
+        ),
+    )
+    parser.add_argument(
+        "--metrics-jsonl",
+        default=None,
+        metavar="PATH",
+        help="Append one JSON line per timed stage (driver start, navigation, downloads, ...) to PATH",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        default=None,
+        metavar="PATH",
+        help="Write aggregated timings and byte/retry counters to PATH in Prometheus text format",
+    )
     headless_group = parser.add_mutually_exclusive_group()
     headless_group.add_argument("--headless", dest="headless", action="store_true")
     headless_group.add_argument("--no-headless", dest="headless", action="store_false")
     parser.set_defaults(headless=True)
-    args = parser.parse_args()
 
+
+def check_store_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    try:
+        resolve_blocked_urls(args.block_resources)
+    except ValueError as e:
+        parser.error(str(e))
+    atexit.register(metrics.configure(args.metrics_jsonl, args.metrics_prom).close)
+
+
+def build_processor(args: argparse.Namespace) -> Callable[..., Dict[str, Any]]:
+    """Set up clients, caches and indexes once; returns ``process(job, pool=None)``
+    which scrapes and stores one profile."""
     base_url = args.supabase_url or _require_env("SUPABASE_URL")
     headers = build_headers(args.supabase_service_role)
     headers.setdefault("Accept", "application/json")
 
     proxy_url = args.proxy or os.getenv("PROXY_URL")
-
-    data = scrape_instagram_profile(
-        args.username,
-        headless=args.headless,
-        timeout=args.timeout,
-        debug=args.debug,
-        proxy=proxy_url,
+    proxy_list = args.proxy_list or os.getenv("PROXY_LIST")
+    proxy_pool = None
+    if proxy_list and not args.proxy:
+        proxy_pool = ProxyPool(
+            load_proxy_list(proxy_list), strategy=args.proxy_strategy, debug=args.debug
+        )
+        proxy_url = None
+    configure_http(
+        pool_size=max(args.http_pool_size, args.download_concurrency, args.upload_concurrency),
+        timeout=args.http_timeout,
+        retries=args.http_retries,
+        http2=args.http2,
     )
+    workers = {
+        "download": args.download_concurrency,
+        "convert": args.convert_workers,
+        "upload": args.upload_concurrency,
+        "ai": args.ai_concurrency,
+    }
 
-    run_id = args.run_id or str(uuid.uuid4())
-
-    uploaded_count = 0
-    for p in data.get("posts", []):
-        img_url = p.get("img_src")
-        caption = p.get("img_caption") or ""
-        if not img_url:
-            continue
-        content_bytes, content_type = download_bytes(img_url)
-        # Optional convert to WebP before hashing/naming
-        if args.convert_webp:
-            content_bytes = convert_image_to_webp(content_bytes)
-            content_type = "image/webp"
-            ext = ".webp"
-        else:
-            ext = guess_extension(content_type, img_url)
-        # Derive stable filename from content hash and extension
-        sha1 = hashlib.sha1(content_bytes).hexdigest()[:16]
-        object_name = derive_object_name(args.project_id, sha1, ext)
-
-        upload_to_storage(
-            base_url,
-            headers,
-            "assets",
-            object_name,
-            content_bytes,
-            content_type=content_type,
+    index = HashIndex(cache_dir=args.cache_dir) if args.dedupe else None
+    refreshed: set = set()
+    marks = HighWaterMarks(cache_dir=args.cache_dir) if args.incremental else None
+    enricher = None
+    if args.openai_api_key:
+        enricher = AiEnricher(
+            args.openai_api_key,
+            args.openai_model,
+            base_url=args.openai_base_url,
+            requests_per_minute=args.ai_rpm,
+            max_image_px=args.ai_max_image_px,
+            cache=AiCache(cache_dir=args.cache_dir) if args.ai_cache else None,
         )
+    url_cache = None
+    if args.url_cache != "off":
+        url_cache = UrlCache(cache_dir=args.cache_dir, max_entries=args.url_cache_size)
 
-        # Prepare AI metadata if requested
-        title_text = None
-        description_text = caption
-        if args.openai_api_key:
-            t, d = ai_generate_title_description(
-                content_bytes,
-                content_type,
-                caption,
-                args.openai_api_key,
-                args.openai_model,
-            )
-            title_text, description_text = t, d
+    journal = RunJournal(cache_dir=args.cache_dir) if args.journal else None
 
-        row = {
-            "project_id": args.project_id,
-            "filename": object_name,
-            "type": "image",
-            "metadata": {
-                "source": "instagram",
-                "instagram": args.username,
-                "run_id": run_id,
-            },
-            "title": title_text,
-            "description": description_text,
+    def journaled(posts, run_id: str, username: str, info: Dict[str, Any]):
+        yield from posts
+        # Only a scrape that ran to the end can stand in for a new one
+        if not info.get("error"):
+            journal.finish_scrape(run_id, username, info)
+
+    def process(job: Dict[str, Any], pool=None) -> Dict[str, Any]:
+        username = job["username"]
+
+        def opt(name: str) -> Any:
+            return job.get(name, getattr(args, name))
+
+        project_id = job.get("project_id") or args.project_id
+        if not project_id:
+            raise ValueError(f"No project_id for {username}")
+        if index is not None:
+            refresh = args.refresh_dedupe_index and project_id not in refreshed
+            refreshed.add(project_id)
+            try:
+                loaded = index.warm(
+                    project_id,
+                    lambda prefix: list_storage_objects(base_url, headers, "assets", prefix),
+                    refresh=refresh,
+                )
+                if args.debug and loaded:
+                    print(f"[DEBUG] Dedupe index warmed with {loaded} objects for {project_id}")
+            except HttpError as e:
+                print(f"[store] Could not list storage for dedupe index: {e}", file=sys.stderr)
+        run_id = job.get("run_id") or args.run_id or str(uuid.uuid4())
+        scraped = journal.scrape(run_id, username) if journal else None
+        if scraped is not None:
+            # Resuming: reuse the recorded scrape instead of fetching the profile again
+            if args.debug:
+                print(f"[DEBUG] Resuming run {run_id} for {username} from the journal")
+            info: Dict[str, Any] = dict(scraped)
+            posts = journal.posts(run_id, username)
+        else:
+            info = {}
+            # Posts flow into the store pipeline as they are extracted
+            posts = iter_instagram_profile(
+                username,
+                headless=args.headless,
+                timeout=args.timeout,
+                debug=args.debug,
+                proxy=job.get("proxy") or proxy_url,
+                pool=pool,
+                strategy=opt("extract_strategy"),
+                block=args.block_resources,
+                since=marks.get(username) if marks else None,
+                max_posts=opt("max_posts"),
+                until=args.until,
+                max_scrolls=opt("max_scrolls"),
+                proxy_pool=proxy_pool,
+                engine=opt("engine"),
+                info=info,
+            )
+            if journal is not None:
+                posts = journaled(posts, run_id, username, info)
+        with metrics.span("profile", username=username) as span:
+            stored = store_profile(
+                {"username": username, "posts": posts},
+                project_id,
+                username,
+                base_url,
+                headers,
+                run_id,
+                convert_webp=opt("convert_webp"),
+                webp_preset=opt("webp_preset"),
+                webp_max_dim=opt("webp_max_dim"),
+                webp_min_bytes=args.webp_min_bytes,
+                webp_keep_original=args.webp_keep_original,
+                workers=workers,
+                queue_size=args.queue_size,
+                spool_max_memory=args.spool_max_kb * 1024,
+                insert_batch_size=args.insert_batch_size,
+                insert_flush_seconds=args.insert_flush_seconds,
+                upsert=args.upsert,
+                index=index,
+                url_cache=url_cache,
+                url_cache_mode=args.url_cache,
+                enricher=enricher,
+                journal=journal,
+            )
+            span.update(
+                source=info.get("source"),
+                posts=info.get("total_posts"),
+                added=stored["added"],
+                skipped=stored["skipped"],
+                failed=stored["failed"],
+            )
+        metrics.get_metrics().flush()
+        complete = not stored["failed"] and not info.get("error")
+        if marks and complete:
+            # Only move the mark once every new post is scraped and stored, so
+            # failures and cut-short scrapes are retried
+            marks.advance(username, [info.get("newest")])
+        result = {
+            "status": "ok" if complete else "partial",
+            "username": username,
+            "source": info.get("source"),
+            "added": stored["added"],
+            "skipped": stored["skipped"],
+            "failed": stored["failed"],
+            "bucket": "assets",
+            "run_id": run_id,
         }
-        insert_asset_row(base_url, headers, row)
-        uploaded_count += 1
-
-    print(
-        json.dumps(
-            {
-                "status": "ok",
-                "username": args.username,
-                "added": uploaded_count,
-                "bucket": "assets",
-                "run_id": run_id,
-            },
-            ensure_ascii=False,
-        )
+        if info.get("error"):
+            result["error"] = info["error"]
+        if "resumed" in stored:
+            result["resumed"] = stored["resumed"]
+        if "webp" in stored:
+            result["webp"] = stored["webp"]
+        return result
+
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scrape Instagram and upload images to assets bucket; insert rows into assets table"
+    )
+    target_group = parser.add_mutually_exclusive_group(required=True)
+    target_group.add_argument("--username", "-u", help="Instagram username")
+    target_group.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Process many profiles: usernames or JSON lines ({\"username\", \"project_id\"}) from FILE ('-' for stdin)",
     )
+    add_store_arguments(parser)
+    args = parser.parse_args()
+    check_store_arguments(parser, args)
+    if not args.batch and not args.project_id:
+        parser.error("--project-id is required unless --batch is used")
+
+    process = build_processor(args)
+
+    if args.batch:
+        with DriverPool(
+            create_driver,
+            size=args.concurrency,
+            max_pages=args.pool_max_pages,
+            max_rss_mb=args.pool_max_rss_mb,
+            max_idle=args.concurrency,
+            debug=args.debug,
+        ) as pool:
+            failed = 0
+            for result in run_batch(
+                read_jobs(args.batch),
+                lambda job: process(job, pool),
+                args.concurrency,
+            ):
+                if result.get("status") != "ok":
+                    failed += 1
+                print(json.dumps(result, ensure_ascii=False), flush=True)
+        if failed:
+            sys.exit(1)
+        return
+
+    result = process({"username": args.username})
+    print(json.dumps(result, ensure_ascii=False))
+    if result["status"] != "ok":
+        sys.exit(1)
 
 
 if __name__ == "__main__":
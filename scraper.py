@@ -1,32 +1,60 @@
 from __future__ import annotations
 
+import functools
 import random
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse, unquote
 import os
 import shutil
 import sys
+import time
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-
+from utils import metrics
+from utils.blocking import apply_blocking, resolve_blocked_urls
 from utils.debug import dump_debug_artifacts
+from utils.driver_pool import DriverPool
+from utils.fast_path import FastPathUnavailable, fetch_profile_http
+from utils.http import DESKTOP_USER_AGENTS
+from utils.instagram_api import API_SCOPES, INSTAGRAM_URL, new_api_posts, wait_for_api_posts
 from utils.proxy import build_proxy_auth_extension
+from utils.proxy_pool import ProxyPool
+from utils.replay import ReplayInterceptor, save_har
+from utils.pagination import paginate, post_filter
+from utils.watermark import newest_mark
+
+# Selenium and selenium-wire are imported where they are used: the HTTP fast
+# path and `--help` never pay for them, and selenium-wire (a vendored mitmproxy)
+# only loads for proxies, API capture and record/replay.
+if TYPE_CHECKING:
+    from selenium import webdriver
+
 
-try:
-    from seleniumwire import webdriver as wire_webdriver
+@functools.lru_cache(maxsize=None)
+def _load_seleniumwire():
+    """``(seleniumwire.webdriver, None)``, or ``(None, import error)``."""
+    try:
+        from seleniumwire import webdriver as wire_webdriver
+    except Exception as e:
+        return None, repr(e)
+    return wire_webdriver, None
 
-    _SW_IMPORT_ERR = None
-except Exception as e:
-    wire_webdriver = None
-    _SW_IMPORT_ERR = repr(e)
 
+def create_driver(
+    headless: bool,
+    debug: bool,
+    proxy: str | None,
+    capture: bool = False,
+    block: str | None = None,
+    wire: bool = False,
+) -> webdriver.Chrome:
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
 
-def create_driver(headless: bool, debug: bool, proxy: str | None) -> webdriver.Chrome:
+    blocked_urls = resolve_blocked_urls(block)
+    wire_webdriver, sw_import_err = (
+        _load_seleniumwire() if (proxy or capture or wire) else (None, None)
+    )
     # Avoid Selenium Manager by providing explicit chromedriver path
     chromedriver_path = shutil.which("chromedriver") or "/usr/local/bin/chromedriver"
     if not os.path.exists(chromedriver_path):
@@ -55,12 +83,6 @@ def create_driver(headless: bool, debug: bool, proxy: str | None) -> webdriver.C
     if os.path.exists(chrome_bin):
         options.binary_location = chrome_bin
 
-    DESKTOP_USER_AGENTS = [
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15",
-        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
-    ]
     ua = random.choice(DESKTOP_USER_AGENTS)
     options.add_argument(f"--user-agent={ua}")
 
@@ -69,6 +91,18 @@ def create_driver(headless: bool, debug: bool, proxy: str | None) -> webdriver.C
         options.add_argument("--v=1")
         options.set_capability("goog:loggingPrefs", {"browser": "ALL"})
 
+    # JSON capture: buffer only the profile/timeline API responses and let
+    # driver.get return right away so we can stop as soon as they arrive
+    capture = capture and wire_webdriver is not None
+    capture_options = {}
+    if capture:
+        options.page_load_strategy = "none"
+        capture_options = {"request_storage": "memory", "request_storage_max_size": 200}
+    # Record/replay: selenium-wire keeps every exchange, not just API responses
+    wire = wire and wire_webdriver is not None
+    if wire:
+        capture_options = {"request_storage": "memory", "request_storage_max_size": 5000}
+
     if proxy:
         parsed = urlparse(proxy)
         scheme = (parsed.scheme or "http").lower()
@@ -98,7 +132,8 @@ def create_driver(headless: bool, debug: bool, proxy: str | None) -> webdriver.C
                 "proxy": {
                     "http": http_proxy_url,
                     "https": https_proxy_url,
-                }
+                },
+                **capture_options,
             }
 
             driver = wire_webdriver.Chrome(
@@ -114,7 +149,14 @@ def create_driver(headless: bool, debug: bool, proxy: str | None) -> webdriver.C
             # Native Chrome fallback: flags or auth extension
             if user and pwd:
                 try:
-                    ext_path = build_proxy_auth_extension(scheme, host, port, user, pwd)
+                    ext_path = build_proxy_auth_extension(
+                        scheme,
+                        host,
+                        port,
+                        user,
+                        pwd,
+                        manifest_version=int(os.environ.get("PROXY_EXT_MANIFEST_VERSION", "3")),
+                    )
                     options.add_extension(ext_path)
                     if debug:
                         print(
@@ -137,11 +179,21 @@ def create_driver(headless: bool, debug: bool, proxy: str | None) -> webdriver.C
             driver = webdriver.Chrome(service=service, options=options)
             if debug:
                 msg = f"[DEBUG] selenium-wire not available (py={sys.executable}); native Chrome initialized"
-                if _SW_IMPORT_ERR:
-                    msg += f" — import error: {_SW_IMPORT_ERR}"
+                if sw_import_err:
+                    msg += f" — import error: {sw_import_err}"
                 print(msg)
+    elif capture or wire:
+        driver = wire_webdriver.Chrome(
+            service=service,
+            options=options,
+            seleniumwire_options=capture_options,
+        )
+        if debug:
+            print("[DEBUG] Using selenium-wire for traffic capture (no proxy)")
     else:
         driver = webdriver.Chrome(service=service, options=options)
+    if capture and not wire:
+        driver.scopes = API_SCOPES
     try:
         driver.execute_script(
             "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
@@ -156,24 +208,250 @@ def create_driver(headless: bool, debug: bool, proxy: str | None) -> webdriver.C
         )
     except Exception:
         pass
+    if blocked_urls:
+        try:
+            apply_blocking(driver, blocked_urls)
+            if debug:
+                print(f"[DEBUG] Blocking {len(blocked_urls)} URL patterns ({block})")
+        except Exception as e:
+            if debug:
+                print(f"[DEBUG] Failed to enable request blocking: {e}")
     return driver
 
 
-def scrape_instagram_profile(
+# Collects every post anchor under the root in one WebDriver round trip.
+# Mirrors extract_posts_elements: <a> with an <img>, caption from ../h2/span.
+_EXTRACT_POSTS_JS = """
+var root = arguments[0] || document;
+var links = root.getElementsByTagName('a');
+var out = [];
+for (var i = 0; i < links.length; i++) {
+  var a = links[i];
+  var img = a.getElementsByTagName('img')[0];
+  if (!img || !img.src) continue;
+  var caption = '';
+  var parent = a.parentElement;
+  var span = parent ? parent.querySelector('h2 > span') : null;
+  if (span) caption = span.innerHTML;
+  var pinned = !!a.querySelector('svg[aria-label*="pinned" i]');
+  out.push({img_src: img.src, img_caption: caption, permalink: a.href || '', pinned: pinned});
+}
+return out;
+"""
+
+
+def extract_posts_script(driver, root=None) -> list[dict]:
+    return list(driver.execute_script(_EXTRACT_POSTS_JS, root) or [])
+
+
+def extract_posts_elements(driver, root=None) -> list[dict]:
+    """Per-element extraction: several WebDriver round trips per anchor."""
+    from selenium.common.exceptions import NoSuchElementException
+    from selenium.webdriver.common.by import By
+
+    if root is not None:
+        links = root.find_elements(By.TAG_NAME, "a")
+    else:
+        try:
+            links = driver.find_elements(By.TAG_NAME, "a")
+        except Exception:
+            links = []
+
+    posts = []
+    for link in links:
+        try:
+            img = link.find_element(By.TAG_NAME, "img")
+            src = img.get_attribute("src")
+            if not src:
+                continue
+            caption = ""
+            try:
+                parent = link.find_element(By.XPATH, "./..")
+                h2_span = parent.find_element(By.XPATH, ".//h2/span")
+                caption = h2_span.get_attribute("innerHTML")
+            except NoSuchElementException:
+                pass
+            posts.append(
+                {
+                    "img_src": src,
+                    "img_caption": caption,
+                    "permalink": link.get_attribute("href") or "",
+                }
+            )
+        except NoSuchElementException:
+            continue
+    return posts
+
+
+EXTRACT_STRATEGIES = {
+    "script": extract_posts_script,
+    "elements": extract_posts_elements,
+}
+
+# "auto" tries the browser-free HTTP fast path and falls back to Chrome
+ENGINES = ("auto", "http", "browser")
+
+
+def _result(username: str, posts: list, info: dict) -> dict:
+    result = {
+        "username": username,
+        "total_posts": len(posts),
+        "posts": posts,
+        "source": info.get("source"),
+    }
+    for key in ("fallback_reason", "error"):
+        if info.get(key):
+            result[key] = info[key]
+    return result
+
+
+def _timed(posts, stats: dict):
+    """Yield from ``posts``, adding only the time spent producing them to
+    ``stats["busy"]`` (not the time the consumer holds each post)."""
+    it = iter(posts)
+    while True:
+        started = time.perf_counter()
+        try:
+            post = next(it)
+        except StopIteration:
+            stats["busy"] += time.perf_counter() - started
+            return
+        stats["busy"] += time.perf_counter() - started
+        yield post
+
+
+def iter_instagram_profile(
     username: str,
     headless: bool = True,
     timeout: int = 30,
     debug: bool = False,
     proxy: str | None = None,
+    pool: DriverPool | None = None,
+    strategy: str = "script",
+    block: str | None = None,
+    since: dict | None = None,
+    max_posts: int | None = None,
+    until: int | None = None,
+    max_scrolls: int = 50,
+    proxy_pool: ProxyPool | None = None,
+    engine: str = "auto",
+    record: str | None = None,
+    replay: str | None = None,
+    info: dict | None = None,
 ):
+    """Yield a profile's posts as they are extracted, deduped on the fly.
+
+    ``info`` is filled in as the scrape goes: ``source``, ``total_posts``,
+    ``newest`` (high-water mark of the yielded posts) and, when relevant,
+    ``fallback_reason``/``error`` (set when the scrape ended early). The browser (and proxy lease) is held
+    until the generator is exhausted or closed.
+    """
+    if info is None:
+        info = {}
+    info.update(source=None, total_posts=0, newest=None)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    if record or replay:
+        # Sessions are recorded from (and replayed into) the browser
+        if engine == "http":
+            raise ValueError("record/replay needs the browser engine")
+        wire_webdriver, sw_import_err = _load_seleniumwire()
+        if wire_webdriver is None:
+            raise RuntimeError(f"selenium-wire is required for record/replay: {sw_import_err}")
+        engine = "browser"
+    lease = None
+    if proxy_pool is not None and not proxy:
+        lease = proxy_pool.lease()
+        proxy = lease.url
+    # Outcome reported back to the proxy pool
+    served = {"ok": False, "latency": None, "login_wall": False}
+
+    def emit(post: dict) -> dict:
+        info["total_posts"] += 1
+        info["newest"] = newest_mark((info["newest"], post))
+        return post
+
     options_msg = (
-        f"headless={headless}, timeout={timeout}, proxy={'yes' if proxy else 'no'}"
+        f"headless={headless}, timeout={timeout}, proxy={'yes' if proxy else 'no'}, "
+        f"strategy={strategy}, block={block or 'full'}, engine={engine}"
     )
     if debug:
         print(f"[DEBUG] scrape options: {options_msg}")
 
-    driver = create_driver(headless=headless, debug=debug, proxy=proxy)
+    check = post_filter(since, until)
+    if engine != "browser":
+        started = time.monotonic()
+        try:
+            with metrics.span("http_fast_path", username=username) as span:
+                try:
+                    posts = fetch_profile_http(
+                        username,
+                        proxy=proxy,
+                        timeout=timeout,
+                        check=check,
+                        max_posts=max_posts,
+                        paginate=bool(max_scrolls and (max_posts or since or until)),
+                        debug=debug,
+                    )
+                except FastPathUnavailable as e:
+                    span.update(ok=False, fallback_reason=e.reason)
+                    raise
+                span["posts"] = len(posts)
+        except FastPathUnavailable as e:
+            info["fallback_reason"] = e.reason
+            if debug:
+                print(f"[DEBUG] HTTP fast path unavailable: {e.reason}")
+            if engine == "http":
+                # In auto mode the browser gets its own chance on this proxy
+                served["login_wall"] = e.login_wall
+                if lease is not None:
+                    proxy_pool.report(lease, **served)
+                info.update(source="http", error=e.reason)
+                info.pop("fallback_reason")
+                return
+        else:
+            served.update(ok=True, latency=time.monotonic() - started)
+            if lease is not None:
+                proxy_pool.report(lease, **served)
+            if debug:
+                print(
+                    f"[DEBUG] HTTP fast path: {len(posts)} posts in "
+                    f"{time.monotonic() - started:.2f}s"
+                )
+            info["source"] = "http"
+            for post in posts:
+                yield emit(post)
+            return
+
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    info["source"] = "browser"
+    capture = strategy == "api"
+    if capture and _load_seleniumwire()[0] is None:
+        if debug:
+            print("[DEBUG] selenium-wire not available; api strategy falls back to script")
+        strategy, capture = "script", False
+    driver_kwargs = {"headless": headless, "debug": debug, "proxy": proxy}
+    if capture:
+        driver_kwargs["capture"] = True
+    if block:
+        driver_kwargs["block"] = block
+    if record or replay:
+        driver_kwargs["wire"] = True
+    with metrics.span("driver_start", username=username, pooled=pool is not None):
+        if pool is not None:
+            driver = pool.acquire(**driver_kwargs)
+        else:
+            driver = create_driver(**driver_kwargs)
+    broken = False
+    interceptor = None
     try:
+        if replay:
+            interceptor = ReplayInterceptor(replay, debug=debug)
+            driver.request_interceptor = interceptor
         if debug:
             try:
                 driver.get(
@@ -192,20 +470,67 @@ def scrape_instagram_profile(
                 )
             except Exception as e:
                 print(f"[DEBUG] Failed to probe proxy IP: {e}")
-        driver.get(f"https://www.instagram.com/{username}/")
+        if capture or record:
+            # Drop anything captured while probing so only this profile is parsed
+            del driver.requests
+        nav_started = time.monotonic()
+        with metrics.span("navigate", username=username):
+            driver.get(f"{INSTAGRAM_URL}/{username}/")
         wait = WebDriverWait(driver, timeout)
 
+        scrolls = max_scrolls if (max_posts or since or until) else 0
+
+        if capture:
+            with metrics.span("api_wait", username=username) as span:
+                first = wait_for_api_posts(driver, timeout)
+                span["ok"] = bool(first)
+            if first:
+                served.update(ok=True, latency=time.monotonic() - nav_started)
+                processed: set = set()
+                timing = {"busy": 0.0}
+                for post in _timed(
+                    paginate(
+                        driver,
+                        lambda d: new_api_posts(d, processed),
+                        check=check,
+                        max_posts=max_posts,
+                        max_scrolls=scrolls,
+                        debug=debug,
+                    ),
+                    timing,
+                ):
+                    yield emit(post)
+                metrics.observe(
+                    "extract",
+                    timing["busy"],
+                    username=username,
+                    strategy="api",
+                    posts=info["total_posts"],
+                )
+                if debug:
+                    print(
+                        f"[DEBUG] extract strategy=api: {info['total_posts']} posts in "
+                        f"{timing['busy'] * 1000:.1f} ms"
+                    )
+                return
+            if debug:
+                print("[DEBUG] No API responses captured; falling back to DOM script")
+            strategy = "script"
+
         if debug:
             print("[DEBUG] Current URL:", driver.current_url)
             print("[DEBUG] Page title:", driver.title)
 
         article = None
+        wait_started = time.perf_counter()
         try:
             article = wait.until(
                 EC.presence_of_element_located((By.TAG_NAME, "article"))
             )
+            served["latency"] = time.monotonic() - nav_started
         except TimeoutException:
             if "/accounts/login" in driver.current_url or "Log in" in driver.title:
+                served["login_wall"] = True
                 if debug:
                     print(
                         "[DEBUG] Redirected to login on desktop. Trying mobile site..."
@@ -220,56 +545,99 @@ def scrape_instagram_profile(
                         print(
                             "[DEBUG] Mobile site did not expose <article>. Will broad-scan anchors."
                         )
+        metrics.observe(
+            "article_wait",
+            time.perf_counter() - wait_started,
+            ok=article is not None,
+            username=username,
+            login_wall=served["login_wall"],
+        )
 
-        posts = []
-        links = []
-        if article:
-            links = article.find_elements(By.TAG_NAME, "a")
-        else:
-            try:
-                links = driver.find_elements(By.TAG_NAME, "a")
-            except Exception:
-                links = []
+        if strategy not in EXTRACT_STRATEGIES:
+            raise ValueError(f"Unknown extraction strategy: {strategy}")
+        active = {"strategy": strategy}
 
-        for link in links:
+        def collect(d):
             try:
-                img = link.find_element(By.TAG_NAME, "img")
-                src = img.get_attribute("src")
-                if not src:
-                    continue
-                caption = ""
-                try:
-                    parent = link.find_element(By.XPATH, "./..")
-                    h2_span = parent.find_element(By.XPATH, ".//h2/span")
-                    caption = h2_span.get_attribute("innerHTML")
-                except NoSuchElementException:
-                    pass
-                posts.append({"img_src": src, "img_caption": caption})
-            except NoSuchElementException:
-                continue
+                return EXTRACT_STRATEGIES[active["strategy"]](d, article)
+            except WebDriverException as e:
+                if active["strategy"] == "elements":
+                    raise
+                if debug:
+                    print(
+                        f"[DEBUG] {active['strategy']} extraction failed ({e}); falling back to elements"
+                    )
+                active["strategy"] = "elements"
+                return extract_posts_elements(d, article)
 
-        # De-dup by img_src
+        served["ok"] = article is not None
+        timing = {"busy": 0.0}
+        # De-dup by img_src as posts arrive
         seen = set()
-        unique_posts = []
-        for p in posts:
-            s = p.get("img_src")
+        for post in _timed(
+            paginate(
+                driver,
+                collect,
+                check=check,
+                max_posts=max_posts,
+                max_scrolls=scrolls,
+                debug=debug,
+            ),
+            timing,
+        ):
+            s = post.get("img_src")
             if s and s not in seen:
                 seen.add(s)
-                unique_posts.append(p)
-
-        return {
-            "username": username,
-            "total_posts": len(unique_posts),
-            "posts": unique_posts,
-        }
+                served["ok"] = True
+                yield emit(post)
+        metrics.observe(
+            "extract",
+            timing["busy"],
+            username=username,
+            strategy=active["strategy"],
+            posts=info["total_posts"],
+        )
+        if debug:
+            print(
+                f"[DEBUG] extract strategy={active['strategy']}: {info['total_posts']} posts in "
+                f"{timing['busy'] * 1000:.1f} ms"
+            )
     except TimeoutException:
+        info["error"] = "timeout"
         if debug:
             dump_debug_artifacts(driver, prefix=f"timeout_{username}")
-        return {"username": username, "total_posts": 0, "posts": []}
     except Exception as e:
+        broken = True
+        info["error"] = str(e)
         print(f"Error scraping profile: {str(e)}")
         if debug:
             dump_debug_artifacts(driver, prefix=f"error_{username}")
-        return {"username": username, "total_posts": 0, "posts": []}
     finally:
-        driver.quit()
+        if record:
+            try:
+                saved = save_har(driver, record)
+                if debug:
+                    print(f"[DEBUG] Recorded {saved} exchanges to {record}")
+            except Exception as e:
+                print(f"Failed to record session to {record}: {e}", file=sys.stderr)
+        if interceptor is not None:
+            if debug:
+                print(f"[DEBUG] Replay: {interceptor.hits} served, {interceptor.misses} not recorded")
+            try:
+                del driver.request_interceptor
+            except Exception:
+                broken = True
+        if pool is not None:
+            pool.release(driver, discard=broken)
+        else:
+            driver.quit()
+        if lease is not None:
+            proxy_pool.report(lease, **served)
+
+
+def scrape_instagram_profile(username: str, *args, **kwargs) -> dict:
+    """Collect ``iter_instagram_profile`` into one result dict
+    (``username``, ``total_posts``, ``posts``, ``source``, ...)."""
+    info: dict = {}
+    posts = list(iter_instagram_profile(username, *args, info=info, **kwargs))
+    return _result(username, posts, info)
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from io import BytesIO
+from typing import Any, Dict, Tuple
+
+from utils.cache import cache_path
+
+SYSTEM_PROMPT = (
+    "You generate concise, human-friendly metadata for images. "
+    "Return strict JSON with keys 'title' and 'description'. The title is 1-5 words. "
+    "The description is one short sentence (<= 20 words)."
+)
+
+_clients: Dict[Tuple[str, str | None], Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key: str, base_url: str | None = None):
+    """One OpenAI client per (key, endpoint), shared by every thread."""
+    with _clients_lock:
+        client = _clients.get((api_key, base_url))
+        if client is None:
+            try:
+                from openai import OpenAI  # type: ignore
+            except Exception:
+                print("The 'openai' package is required for AI generation.", file=sys.stderr)
+                sys.exit(2)
+            client = OpenAI(api_key=api_key, base_url=base_url)
+            _clients[(api_key, base_url)] = client
+        return client
+
+
+def fallback_title_description(caption_text: str) -> Tuple[str, str]:
+    title = (caption_text or "Instagram image").strip()[:60]
+    description = (caption_text or "").strip().split("\n")[0][:160]
+    return title, description
+
+
+def downscale_image(image_bytes: bytes, image_mime: str, max_px: int = 512) -> Tuple[bytes, str]:
+    """Shrink an image to fit ``max_px`` as a JPEG before it is base64-encoded.
+
+    The vision models resize large images anyway; sending a small one saves
+    encoding time, request size and upload bandwidth. Returns the input
+    unchanged when Pillow is missing or the image is already small.
+    """
+    try:
+        from PIL import Image  # type: ignore
+    except ImportError:
+        return image_bytes, image_mime
+    try:
+        img = Image.open(BytesIO(image_bytes))
+        if max(img.size) <= max_px and image_mime in ("image/jpeg", "image/png", "image/webp"):
+            return image_bytes, image_mime
+        img.draft("RGB", (max_px, max_px))
+        img = img.convert("RGB")
+        img.thumbnail((max_px, max_px))
+        out = BytesIO()
+        img.save(out, format="JPEG", quality=85)
+        return out.getvalue(), "image/jpeg"
+    except Exception:
+        return image_bytes, image_mime
+
+
+class RateLimiter:
+    """Spaces calls evenly to stay under ``per_minute`` requests per minute."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def ai_cache_key(image_sha1: str, caption_text: str, model: str) -> str:
+    return hashlib.sha1(
+        json.dumps([image_sha1, caption_text or "", model]).encode("utf-8")
+    ).hexdigest()
+
+
+class AiCache:
+    """Generated titles/descriptions, keyed by image sha1 + caption + model."""
+
+    def __init__(self, path: str | None = None, cache_dir: str | None = None):
+        self.path = path or cache_path(cache_dir, "ai.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ai ("
+                " key TEXT PRIMARY KEY, title TEXT NOT NULL, description TEXT NOT NULL,"
+                " model TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Tuple[str, str] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, description FROM ai WHERE key = ?", (key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put(self, key: str, title: str, description: str, model: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ai (key, title, description, model, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, title, description, model, time.time()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class AiEnricher:
+    """Title/description generation shared by all pipeline workers.
+
+    Uses one client per endpoint (``base_url`` points it at any
+    OpenAI-compatible server, e.g. a local stub), an optional
+    ``requests_per_minute`` limit, images downscaled to ``max_image_px``,
+    and an optional ``AiCache`` so reruns don't pay again. Failed calls
+    fall back to the caption and are not cached.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        base_url: str | None = None,
+        requests_per_minute: float | None = None,
+        max_image_px: int = 512,
+        cache: AiCache | None = None,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.max_image_px = max_image_px
+        self.cache = cache
+        self.limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+        self.stats = {"calls": 0, "cached": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _generate(self, image_bytes: bytes, image_mime: str, caption_text: str) -> Tuple[str, str]:
+        client = get_openai_client(self.api_key, self.base_url)
+        image_bytes, image_mime = downscale_image(image_bytes, image_mime, self.max_image_px)
+        data_url = f"data:{image_mime};base64,{base64.b64encode(image_bytes).decode('ascii')}"
+        if self.limiter is not None:
+            self.limiter.wait()
+        resp = client.chat.completions.create(
+            model=self.model,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": f"Instagram caption: {caption_text or ''}"},
+                        {"type": "image_url", "image_url": {"url": data_url}},
+                    ],
+                },
+            ],
+        )
+        data = json.loads(resp.choices[0].message.content or "{}")
+        fallback_title, fallback_description = fallback_title_description(caption_text)
+        title = str(data.get("title") or "").strip() or fallback_title
+        description = str(data.get("description") or "").strip() or fallback_description
+        return title, description
+
+    def describe(
+        self,
+        image_bytes: bytes,
+        image_mime: str,
+        caption_text: str,
+        image_sha1: str | None = None,
+    ) -> Tuple[str, str]:
+        key = None
+        if self.cache is not None:
+            key = ai_cache_key(
+                image_sha1 or hashlib.sha1(image_bytes).hexdigest(), caption_text, self.model
+            )
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count("cached")
+                return cached
+        self._count("calls")
+        try:
+            title, description = self._generate(image_bytes, image_mime, caption_text)
+        except Exception as e:
+            self._count("failed")
+            print(f"[AI] Generation failed, falling back to caption: {e}", file=sys.stderr)
+            return fallback_title_description(caption_text)
+        if key is not None:
+            self.cache.put(key, title, description, self.model)
+        return title, description
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, Set
+
+
+def read_jobs(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield batch jobs from a file (``-`` for stdin), one per line.
+
+    Each line is either a JSON object with at least ``username`` (extra keys
+    such as ``project_id`` are passed through), a JSON string, or a bare
+    username. Blank lines and ``#`` comments are skipped.
+    """
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for lineno, raw in enumerate(stream, 1):
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError:
+                value = line
+            if isinstance(value, str):
+                job: Dict[str, Any] = {"username": value}
+            elif isinstance(value, dict):
+                job = dict(value)
+            else:
+                print(f"[batch] Skipping line {lineno}: unsupported value", file=sys.stderr)
+                continue
+            username = str(job.get("username") or "").strip().lstrip("@")
+            if not username:
+                print(f"[batch] Skipping line {lineno}: missing username", file=sys.stderr)
+                continue
+            job["username"] = username
+            yield job
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _run_one(worker: Callable[[Dict[str, Any]], Dict[str, Any]], job: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.monotonic()
+    try:
+        result = dict(worker(job))
+        result.setdefault("status", "ok")
+    except (Exception, SystemExit) as e:
+        # Missing optional dependencies exit(2); record that per profile instead
+        result = {"username": job.get("username"), "status": "error", "error": repr(e)}
+    result["elapsed_s"] = round(time.monotonic() - started, 3)
+    return result
+
+
+def run_batch(
+    jobs: Iterable[Dict[str, Any]],
+    worker: Callable[[Dict[str, Any]], Dict[str, Any]],
+    concurrency: int = 1,
+) -> Iterator[Dict[str, Any]]:
+    """Run ``worker`` over ``jobs`` with at most ``concurrency`` in flight.
+
+    Results are yielded in completion order. Jobs are pulled lazily, so the
+    input may be an unbounded stream. A failing job yields an ``error`` result
+    and does not stop the batch.
+    """
+    concurrency = max(1, concurrency)
+    job_iter = iter(jobs)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        in_flight: Set[Future] = set()
+
+        def fill() -> None:
+            while len(in_flight) < concurrency:
+                try:
+                    job = next(job_iter)
+                except StopIteration:
+                    return
+                in_flight.add(pool.submit(_run_one, worker, job))
+
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                in_flight.discard(fut)
+                yield fut.result()
+            fill()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from typing import List
+
+# Network.setBlockedURLs patterns ('*' wildcard). Media lives under /v/ on the
+# Instagram/Facebook CDNs; static JS/CSS bundles use /rsrc.php/ and stay allowed.
+MEDIA_PATTERNS = [
+    "*cdninstagram.com/v/*",
+    "*fbcdn.net/v/*",
+    "*.jpg*",
+    "*.jpeg*",
+    "*.png*",
+    "*.gif*",
+    "*.webp*",
+    "*.heic*",
+    "*.mp4*",
+    "*.m4a*",
+    "*.m4v*",
+]
+
+FONT_PATTERNS = ["*.woff*", "*.ttf*", "*.otf*"]
+
+TRACKER_PATTERNS = [
+    "*facebook.com/tr*",
+    "*connect.facebook.net*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*instagram.com/logging/*",
+    "*instagram.com/ajax/bz*",
+    "*graph.instagram.com/logging_client_events*",
+]
+
+STYLE_PATTERNS = ["*.css*"]
+
+BLOCK_PRESETS = {
+    # Load everything (previous behaviour)
+    "full": [],
+    # Skip images/video, fonts and trackers; layout still renders normally
+    "no-media": MEDIA_PATTERNS + FONT_PATTERNS + TRACKER_PATTERNS,
+    # Only documents, scripts and XHR/fetch: smallest transfer, layout may be off
+    "data-only": MEDIA_PATTERNS + FONT_PATTERNS + TRACKER_PATTERNS + STYLE_PATTERNS,
+}
+
+
+def resolve_blocked_urls(spec: str | None) -> List[str]:
+    """Turn a preset name or comma-separated list of patterns into URL patterns.
+
+    Presets and patterns can be mixed, e.g. ``no-media,*.css*``.
+    """
+    patterns: List[str] = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if part in BLOCK_PRESETS:
+            patterns.extend(BLOCK_PRESETS[part])
+        elif "*" in part or "." in part or "/" in part:
+            patterns.append(part)
+        else:
+            raise ValueError(
+                f"Unknown block preset '{part}' (choose from {', '.join(BLOCK_PRESETS)} or give URL patterns)"
+            )
+    # Preserve order, drop duplicates
+    return list(dict.fromkeys(patterns))
+
+
+def apply_blocking(driver, patterns: List[str]) -> None:
+    """Block matching requests in the browser; requires Network.enable to have been sent."""
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+# Query params that only sign or expire a CDN URL; the rest (e.g. ``stp``,
+# the size/crop) pick the image and stay in the cache key
+_SIGNATURE_PARAMS = ("oh", "oe", "ccb", "efg")
+
+
+def default_cache_dir() -> str:
+    """Directory for persistent local state (indexes, caches); ``IG_SCRAPER_CACHE_DIR`` overrides."""
+    return os.environ.get("IG_SCRAPER_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "ig-scraper"
+    )
+
+
+def cache_path(cache_dir: str | None, filename: str) -> str:
+    directory = cache_dir or default_cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+def url_cache_key(url: str) -> str:
+    """Cache key for a CDN URL: the path plus the sorted query params that
+    select the image. Hosts vary per edge and signature params expire, so
+    both are left out."""
+    parsed = urlparse(url)
+    params = sorted(
+        (name, value)
+        for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if name not in _SIGNATURE_PARAMS and not name.startswith("_nc_")
+    )
+    return parsed.path + ("?" + urlencode(params) if params else "")
+
+
+class UrlCache:
+    """Persistent map of source URL -> what it produced last time.
+
+    Entries hold the source validators (ETag, Last-Modified, size) and the
+    sha1/extension/content type of the object that was stored for a given
+    ``variant`` (e.g. raw vs. WebP). Least recently used entries are evicted
+    beyond ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        cache_dir: str | None = None,
+        max_entries: int = 100_000,
+    ):
+        self.path = path or cache_path(cache_dir, "urls.sqlite")
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS urls ("
+                " url_key TEXT NOT NULL, variant TEXT NOT NULL,"
+                " sha1 TEXT NOT NULL, ext TEXT NOT NULL, content_type TEXT,"
+                " etag TEXT, last_modified TEXT, size INTEGER,"
+                " last_used REAL NOT NULL, PRIMARY KEY (url_key, variant))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS urls_lru ON urls (last_used)")
+
+    def get(self, url: str, variant: str) -> Dict[str, Any] | None:
+        key = url_cache_key(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha1, ext, content_type, etag, last_modified, size FROM urls"
+                " WHERE url_key = ? AND variant = ?",
+                (key, variant),
+            ).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE urls SET last_used = ? WHERE url_key = ? AND variant = ?",
+                    (time.time(), key, variant),
+                )
+        sha1, ext, content_type, etag, last_modified, size = row
+        return {
+            "sha1": sha1,
+            "ext": ext,
+            "content_type": content_type,
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": size,
+        }
+
+    def put(
+        self,
+        url: str,
+        variant: str,
+        sha1: str,
+        ext: str,
+        content_type: str | None = None,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        size: int | None = None,
+    ) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls"
+                " (url_key, variant, sha1, ext, content_type, etag, last_modified, size, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url_cache_key(url), variant, sha1, ext, content_type, etag, last_modified, size, time.time()),
+            )
+            self._puts += 1
+            if self._puts % 256 == 0:
+                self._evict()
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM urls").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM urls WHERE rowid IN (SELECT rowid FROM urls ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable
+
+from utils.cache import cache_path
+
+
+class HashIndex:
+    """Local index of storage objects known to exist, per project.
+
+    Object names are content-addressed (``project_id/sha1ext``), so a name in
+    the index means the same bytes were already uploaded and their assets row
+    inserted. The index is warmed from a listing of the storage bucket the
+    first time a project is seen.
+    """
+
+    def __init__(self, path: str | None = None, cache_dir: str | None = None):
+        self.path = path or cache_path(cache_dir, "dedupe.sqlite")
+        self._lock = threading.Lock()
+        self._warm_lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS objects ("
+                " project_id TEXT NOT NULL, object_name TEXT NOT NULL,"
+                " added_at REAL NOT NULL, PRIMARY KEY (project_id, object_name))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS warmed (project_id TEXT PRIMARY KEY, warmed_at REAL NOT NULL)"
+            )
+
+    def has(self, project_id: str, object_name: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM objects WHERE project_id = ? AND object_name = ?",
+                (project_id, object_name),
+            ).fetchone()
+        return row is not None
+
+    def add(self, project_id: str, object_names: Iterable[str]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO objects (project_id, object_name, added_at) VALUES (?, ?, ?)",
+                [(project_id, name, now) for name in object_names],
+            )
+
+    def forget(self, project_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM objects WHERE project_id = ?", (project_id,))
+            self._conn.execute("DELETE FROM warmed WHERE project_id = ?", (project_id,))
+
+    def is_warm(self, project_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM warmed WHERE project_id = ?", (project_id,)
+            ).fetchone()
+        return row is not None
+
+    def warm(
+        self,
+        project_id: str,
+        list_objects: Callable[[str], Iterable[str]],
+        refresh: bool = False,
+    ) -> int:
+        """Load the project's object names from storage unless already done.
+
+        Returns the number of names loaded (0 when the index was already warm).
+        """
+        with self._warm_lock:
+            if refresh:
+                self.forget(project_id)
+            elif self.is_warm(project_id):
+                return 0
+            names = list(list_objects(project_id))
+            self.add(project_id, names)
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO warmed (project_id, warmed_at) VALUES (?, ?)",
+                    (project_id, time.time()),
+                )
+            return len(names)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
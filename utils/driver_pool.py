@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+
+def _process_tree_rss(root_pid: int) -> int:
+    """Return the summed RSS (bytes) of a process and all of its descendants.
+
+    Linux-only (reads /proc); returns 0 when the information is unavailable.
+    """
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r", encoding="utf-8") as f:
+                stat = f.read()
+            # comm may contain spaces/parens: ppid is the 2nd field after the last ')'
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+    total = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        try:
+            with open(f"/proc/{pid}/statm", "r", encoding="utf-8") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            pass
+        stack.extend(children.get(pid, []))
+    return total
+
+
+def driver_rss_bytes(driver) -> int:
+    try:
+        pid = driver.service.process.pid
+    except Exception:
+        return 0
+    return _process_tree_rss(pid)
+
+
+def reset_driver(driver) -> None:
+    """Bring a used driver back to a blank state: one tab, no cookies, no storage."""
+    handles = driver.window_handles
+    if len(handles) > 1:
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+    try:
+        driver.execute_script(
+            "try { window.localStorage.clear(); } catch (e) {}"
+            "try { window.sessionStorage.clear(); } catch (e) {}"
+        )
+    except Exception:
+        pass
+    try:
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        for origin in ("https://www.instagram.com", "https://m.instagram.com"):
+            driver.execute_cdp_cmd(
+                "Storage.clearDataForOrigin",
+                {
+                    "origin": origin,
+                    "storageTypes": "cookies,local_storage,session_storage,indexeddb,service_workers,cache_storage",
+                },
+            )
+    except Exception:
+        driver.delete_all_cookies()
+    # selenium-wire keeps captured traffic in memory until cleared
+    if hasattr(driver, "requests"):
+        try:
+            del driver.requests
+        except Exception:
+            pass
+    driver.get("about:blank")
+
+
+def driver_is_healthy(driver) -> bool:
+    try:
+        return bool(driver.window_handles) and driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+
+class DriverPool:
+    """Keeps warm Chrome sessions keyed by their ``create_driver`` arguments.
+
+    ``size`` idle drivers are kept per key (e.g. per proxy config); a driver is
+    recycled once it has served ``max_pages`` profiles or its process tree
+    exceeds ``max_rss_mb``. ``max_idle`` caps idle drivers across all keys.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[..., Any],
+        size: int = 1,
+        max_pages: int = 50,
+        max_rss_mb: int | None = None,
+        max_idle: int | None = None,
+        debug: bool = False,
+    ):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.max_idle = max_idle
+        self.debug = debug
+        self._lock = threading.Lock()
+        # key -> list of idle drivers (most recently released last)
+        self._idle: Dict[Tuple, List[Any]] = {}
+        # id(driver) -> bookkeeping
+        self._meta: Dict[int, Dict[str, Any]] = {}
+        self._closed = False
+
+    @staticmethod
+    def _key(driver_kwargs: Dict[str, Any]) -> Tuple:
+        return tuple(sorted(driver_kwargs.items()))
+
+    def _log(self, msg: str) -> None:
+        if self.debug:
+            print(f"[DEBUG] [pool] {msg}")
+
+    def _quit(self, driver) -> None:
+        with self._lock:
+            self._meta.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _create(self, key: Tuple, driver_kwargs: Dict[str, Any]):
+        started = time.monotonic()
+        driver = self.factory(**driver_kwargs)
+        with self._lock:
+            self._meta[id(driver)] = {"key": key, "pages": 0, "created": time.time()}
+        self._log(f"started driver in {time.monotonic() - started:.2f}s")
+        return driver
+
+    def warm(self, count: int | None = None, **driver_kwargs) -> None:
+        """Start drivers ahead of time so the first acquisitions are warm."""
+        key = self._key(driver_kwargs)
+        want = self.size if count is None else count
+        with self._lock:
+            have = len(self._idle.get(key, []))
+        for _ in range(max(0, want - have)):
+            driver = self._create(key, driver_kwargs)
+            self._park(key, driver)
+
+    def acquire(self, **driver_kwargs):
+        if self._closed:
+            raise RuntimeError("DriverPool is closed")
+        key = self._key(driver_kwargs)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                driver = idle.pop() if idle else None
+            if driver is None:
+                return self._create(key, driver_kwargs)
+            if driver_is_healthy(driver):
+                self._log("reusing warm driver")
+                return driver
+            self._log("discarding unhealthy idle driver")
+            self._quit(driver)
+
+    def release(self, driver, discard: bool = False) -> None:
+        with self._lock:
+            meta = self._meta.get(id(driver))
+        if meta is None:
+            # Not ours (or already retired)
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            return
+        meta["pages"] += 1
+        if discard or self._closed:
+            self._quit(driver)
+            return
+        if self.max_pages and meta["pages"] >= self.max_pages:
+            self._log(f"recycling driver after {meta['pages']} pages")
+            self._quit(driver)
+            return
+        if self.max_rss_mb:
+            rss_mb = driver_rss_bytes(driver) / (1024 * 1024)
+            if rss_mb > self.max_rss_mb:
+                self._log(f"recycling driver at {rss_mb:.0f} MB RSS")
+                self._quit(driver)
+                return
+        try:
+            reset_driver(driver)
+        except Exception as e:
+            self._log(f"reset failed, discarding driver: {e}")
+            self._quit(driver)
+            return
+        self._park(meta["key"], driver)
+
+    def _park(self, key: Tuple, driver) -> None:
+        evicted = []
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            idle.append(driver)
+            while len(idle) > self.size:
+                evicted.append(idle.pop(0))
+            if self.max_idle is not None:
+                while sum(len(v) for v in self._idle.values()) > self.max_idle:
+                    # Evict the oldest idle driver of the largest bucket
+                    bucket = max(self._idle.values(), key=len)
+                    evicted.append(bucket.pop(0))
+        for d in evicted:
+            self._quit(d)
+
+    @contextmanager
+    def driver(self, **driver_kwargs) -> Iterator[Any]:
+        d = self.acquire(**driver_kwargs)
+        try:
+            yield d
+        except BaseException:
+            self.release(d, discard=True)
+            raise
+        else:
+            self.release(d)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            drivers = [d for idle in self._idle.values() for d in idle]
+            self._idle.clear()
+        for d in drivers:
+            self._quit(d)
+
+    def __enter__(self) -> "DriverPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import random
+import re
+from typing import Any, Callable, Dict, List
+
+from utils.http import DESKTOP_USER_AGENTS, HttpError, get_client
+from utils.instagram_api import INSTAGRAM_URL, dedupe_posts, is_timeline_payload, parse_posts
+
+WEB_PROFILE_INFO_URL = INSTAGRAM_URL + "/api/v1/users/web_profile_info/"
+# Public app id the web client sends with its API calls
+IG_APP_ID = "936619743392459"
+LOGIN_WALL_STATUSES = (401, 403, 429)
+
+_JSON_SCRIPT_RE = re.compile(
+    r"<script[^>]*type=\"application/json\"[^>]*>(.*?)</script>", re.DOTALL
+)
+
+
+class FastPathUnavailable(Exception):
+    """The HTTP fast path could not serve a profile; ``reason`` says why."""
+
+    def __init__(self, reason: str, login_wall: bool = False):
+        super().__init__(reason)
+        self.reason = reason
+        self.login_wall = login_wall
+
+
+def _is_login_redirect(resp) -> bool:
+    return "/accounts/login" in str(getattr(resp, "url", "") or "")
+
+
+def _has_more(payload: Any) -> bool:
+    """Whether the timeline in ``payload`` has another page."""
+    stack = [payload]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            if obj.get("more_available") or (
+                isinstance(obj.get("page_info"), dict) and obj["page_info"].get("has_next_page")
+            ):
+                return True
+            stack.extend(v for v in obj.values() if isinstance(v, (dict, list)))
+        elif isinstance(obj, list):
+            stack.extend(v for v in obj if isinstance(v, (dict, list)))
+    return False
+
+
+def _get(client, url: str, headers: Dict[str, str], timeout: float, **kwargs):
+    try:
+        resp = client.get(url, headers=headers, timeout=timeout, retry=False, **kwargs)
+    except HttpError as e:
+        if e.status in LOGIN_WALL_STATUSES:
+            raise FastPathUnavailable(f"login wall (HTTP {e.status})", login_wall=True)
+        raise FastPathUnavailable(str(e))
+    if _is_login_redirect(resp):
+        resp.close()
+        raise FastPathUnavailable("login wall (redirect)", login_wall=True)
+    return resp
+
+
+def _profile_info(client, username: str, ua: str, timeout: float) -> Any:
+    headers = {
+        "User-Agent": ua,
+        "Referer": f"{INSTAGRAM_URL}/{username}/",
+        "X-IG-App-ID": IG_APP_ID,
+        "Accept": "*/*",
+    }
+    resp = _get(client, WEB_PROFILE_INFO_URL, headers, timeout, params={"username": username})
+    try:
+        return resp.json()
+    except ValueError:
+        return None
+
+
+def _embedded_payloads(client, username: str, ua: str, timeout: float) -> List[Any]:
+    headers = {
+        "User-Agent": ua,
+        "Referer": "https://www.google.com/",
+        "Accept": "text/html,application/xhtml+xml",
+        "Accept-Language": "en-US,en;q=0.9",
+    }
+    resp = _get(client, f"{INSTAGRAM_URL}/{username}/", headers, timeout)
+    payloads = []
+    for blob in _JSON_SCRIPT_RE.findall(resp.text or ""):
+        try:
+            payload = json.loads(blob)
+        except ValueError:
+            continue
+        if is_timeline_payload(payload):
+            payloads.append(payload)
+    return payloads
+
+
+def fetch_profile_http(
+    username: str,
+    proxy: str | None = None,
+    timeout: float = 15,
+    check: Callable[[Dict[str, Any]], str | None] | None = None,
+    max_posts: int | None = None,
+    paginate: bool = False,
+    debug: bool = False,
+) -> List[Dict[str, Any]]:
+    """Profile posts without a browser: the web profile API, then the JSON
+    embedded in the profile HTML.
+
+    ``check`` and ``max_posts`` behave as in ``paginate``. Only the first
+    page is available here, so with ``paginate=True`` a profile that has
+    more posts than the first page covers (and was not cut short by
+    ``check``/``max_posts``) raises ``FastPathUnavailable`` as well.
+    """
+    client = get_client(proxy)
+    ua = random.choice(DESKTOP_USER_AGENTS)
+
+    payloads = []
+    try:
+        payload = _profile_info(client, username, ua, timeout)
+        if is_timeline_payload(payload):
+            payloads.append(payload)
+        elif debug:
+            print("[DEBUG] [http] profile API returned no timeline; trying embedded JSON")
+    except FastPathUnavailable as e:
+        if e.login_wall:
+            raise
+        if debug:
+            print(f"[DEBUG] [http] profile API failed ({e.reason}); trying embedded JSON")
+    if not payloads:
+        payloads = _embedded_payloads(client, username, ua, timeout)
+    if not payloads:
+        raise FastPathUnavailable("no profile data in response")
+
+    posts: List[Dict[str, Any]] = []
+    for post in dedupe_posts(p for payload in payloads for p in parse_posts(payload)):
+        verdict = check(post) if check else None
+        if verdict == "stop":
+            return posts
+        if verdict == "skip":
+            continue
+        posts.append(post)
+        if max_posts and len(posts) >= max_posts:
+            return posts
+    if paginate and any(_has_more(p) for p in payloads):
+        raise FastPathUnavailable("needs pagination")
+    return posts
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable
+
+from utils import metrics
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+DESKTOP_USER_AGENTS = [
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
+]
+
+
+class HttpError(RuntimeError):
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+class _HttpxResponse:
+    """Gives httpx responses the small slice of the requests API we use."""
+
+    def __init__(self, resp):
+        self._resp = resp
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resp, name)
+
+    def iter_content(self, chunk_size: int = 65536):
+        return self._resp.iter_bytes(chunk_size)
+
+
+def _retry_after_seconds(value: str | None) -> float | None:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpClient:
+    """Keep-alive HTTP client shared by downloads, Storage and REST calls.
+
+    Connections are pooled per host (``pool_size`` each). Requests answered
+    with 429/5xx or failing at the connection level are retried with
+    exponential backoff (honouring ``Retry-After``); once retries are
+    exhausted, or on any other unexpected status, ``HttpError`` is raised.
+    ``http2=True`` uses httpx when it is installed with HTTP/2 support.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        timeout: float = 60,
+        retries: int = 3,
+        backoff: float = 0.5,
+        http2: bool = False,
+        proxy: str | None = None,
+    ):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.proxy = proxy
+        self.http2 = False
+        self._session = None
+        if http2:
+            try:
+                import httpx  # type: ignore
+
+                self._session = httpx.Client(
+                    http2=True,
+                    # requests follows redirects by default; CDN downloads and
+                    # the login-wall check (final URL) rely on that
+                    follow_redirects=True,
+                    timeout=timeout,
+                    proxy=proxy,
+                    limits=httpx.Limits(
+                        max_connections=pool_size * 4,
+                        max_keepalive_connections=pool_size,
+                    ),
+                )
+                self.http2 = True
+            except Exception as e:
+                print(f"[http] HTTP/2 unavailable ({e}); using HTTP/1.1 pool", file=sys.stderr)
+        if self._session is None:
+            self._session = self._requests_session()
+
+    def _requests_session(self):
+        try:
+            import requests  # type: ignore
+            from requests.adapters import HTTPAdapter  # type: ignore
+        except ImportError:
+            print(
+                "The 'requests' package is required. Please install dependencies.",
+                file=sys.stderr,
+            )
+            sys.exit(2)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if self.proxy:
+            session.proxies = {"http": self.proxy, "https": self.proxy}
+        return session
+
+    def _send(self, method, url, headers, data, params, timeout, stream):
+        if self.http2:
+            req = self._session.build_request(
+                method, url, headers=headers, content=data, params=params, timeout=timeout
+            )
+            return _HttpxResponse(self._session.send(req, stream=stream))
+        return self._session.request(
+            method,
+            url,
+            headers=headers,
+            data=data,
+            params=params,
+            timeout=timeout,
+            stream=stream,
+        )
+
+    def _connection_errors(self) -> tuple:
+        if self.http2:
+            import httpx  # type: ignore
+
+            return (httpx.TransportError,)
+        import requests  # type: ignore
+
+        return (requests.ConnectionError, requests.Timeout)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Dict[str, str] | None = None,
+        data: Any = None,
+        params: Dict[str, Any] | None = None,
+        timeout: float | None = None,
+        stream: bool = False,
+        ok: Iterable[int] = (200,),
+        retry: bool = True,
+    ):
+        ok = tuple(ok)
+        max_retries = self.retries if retry else 0
+        timeout = timeout or self.timeout
+        conn_errors = self._connection_errors()
+        attempt = 0
+        while True:
+            if hasattr(data, "seek"):
+                data.seek(0)
+            delay = None
+            metrics.count("http_requests")
+            if isinstance(data, (bytes, str)) or (hasattr(data, "seek") and hasattr(data, "__len__")):
+                metrics.count("http_bytes_sent", len(data))
+            try:
+                resp = self._send(method, url, headers, data, params, timeout, stream)
+            except conn_errors as e:
+                if attempt >= max_retries:
+                    raise HttpError(f"{method} {url} failed: {e}") from e
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if resp.status_code in ok:
+                    if not stream:
+                        metrics.count("http_bytes_received", len(resp.content or b""))
+                    return resp
+                body = "" if stream else (resp.text or "")[:500]
+                if resp.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                    resp.close()
+                    raise HttpError(
+                        f"{method} {url} -> {resp.status_code} {body}".rstrip(),
+                        status=resp.status_code,
+                    )
+                error = f"HTTP {resp.status_code}"
+                delay = _retry_after_seconds(resp.headers.get("Retry-After"))
+                resp.close()
+            if delay is None:
+                delay = self.backoff * (2**attempt) * (0.5 + random.random())
+            attempt += 1
+            metrics.count("http_retries")
+            print(
+                f"[http] {method} {url} {error}; retry {attempt}/{max_retries} in {delay:.1f}s",
+                file=sys.stderr,
+            )
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        self._session.close()
+
+
+# Rotated proxy sessions ({sid}) each get a client; keep only the most recent
+MAX_PROXY_CLIENTS = 32
+
+_settings: Dict[str, Any] = {}
+_clients: "OrderedDict[str | None, HttpClient]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def configure(**settings) -> None:
+    """Set defaults (pool_size, timeout, retries, backoff, http2) for shared clients."""
+    with _lock:
+        _settings.update(settings)
+        old = list(_clients.values())
+        _clients.clear()
+    for client in old:
+        client.close()
+
+
+def get_client(proxy: str | None = None) -> HttpClient:
+    """Return the process-wide client (one per outbound proxy).
+
+    Beyond ``MAX_PROXY_CLIENTS`` proxies the least recently used proxy
+    client is closed; the direct client is always kept.
+    """
+    evicted = []
+    with _lock:
+        client = _clients.get(proxy)
+        if client is None:
+            client = HttpClient(proxy=proxy, **_settings)
+            _clients[proxy] = client
+        _clients.move_to_end(proxy)
+        proxied = [key for key in _clients if key is not None]
+        for key in proxied[: max(0, len(proxied) - MAX_PROXY_CLIENTS)]:
+            evicted.append(_clients.pop(key))
+    for old in evicted:
+        old.close()
+    return client
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List
+
+# Profile pages and API calls go here; the benchmark points it at its fixture server
+INSTAGRAM_URL = os.environ.get("IG_SCRAPER_INSTAGRAM_URL", "https://www.instagram.com").rstrip("/")
+
+# selenium-wire scopes: only these endpoints are intercepted and buffered
+API_SCOPES = [
+    r".*instagram\.com/api/v1/users/web_profile_info/.*",
+    r".*instagram\.com/api/v1/feed/user/.*",
+    r".*instagram\.com/graphql/query.*",
+    r".*instagram\.com/api/graphql.*",
+]
+
+
+def _caption_from_graph(node: Dict[str, Any]) -> str:
+    edges = (node.get("edge_media_to_caption") or {}).get("edges") or []
+    if edges:
+        return str((edges[0].get("node") or {}).get("text") or "")
+    return ""
+
+
+def _graph_node_to_post(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a GraphQL ``edge_owner_to_timeline_media`` node."""
+    shortcode = node.get("shortcode")
+    post: Dict[str, Any] = {
+        "img_src": node.get("display_url"),
+        "img_caption": _caption_from_graph(node),
+        "permalink": f"https://www.instagram.com/p/{shortcode}/",
+        "shortcode": shortcode,
+        "taken_at": node.get("taken_at_timestamp"),
+        "is_video": bool(node.get("is_video")),
+        "pinned": bool(node.get("pinned_for_users")),
+    }
+    if node.get("video_url"):
+        post["video_url"] = node["video_url"]
+    children = []
+    for edge in (node.get("edge_sidecar_to_children") or {}).get("edges") or []:
+        child = edge.get("node") or {}
+        entry = {"img_src": child.get("display_url"), "is_video": bool(child.get("is_video"))}
+        if child.get("video_url"):
+            entry["video_url"] = child["video_url"]
+        children.append(entry)
+    if children:
+        post["children"] = children
+    return post
+
+
+def _best_candidate(item: Dict[str, Any]) -> str | None:
+    candidates = (item.get("image_versions2") or {}).get("candidates") or []
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda c: (c.get("width") or 0) * (c.get("height") or 0))
+    return best.get("url")
+
+
+def _best_video(item: Dict[str, Any]) -> str | None:
+    versions = item.get("video_versions") or []
+    if not versions:
+        return None
+    best = max(versions, key=lambda v: (v.get("width") or 0) * (v.get("height") or 0))
+    return best.get("url")
+
+
+def _v1_item_to_post(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a private-API style media item (``feed/user`` and the xdt graphql connection)."""
+    code = item.get("code")
+    caption = item.get("caption") or {}
+    post: Dict[str, Any] = {
+        "img_src": _best_candidate(item),
+        "img_caption": str(caption.get("text") or "") if isinstance(caption, dict) else "",
+        "permalink": f"https://www.instagram.com/p/{code}/",
+        "shortcode": code,
+        "taken_at": item.get("taken_at"),
+        "is_video": bool(item.get("video_versions")),
+        "pinned": bool(item.get("timeline_pinned_user_ids")),
+    }
+    video = _best_video(item)
+    if video:
+        post["video_url"] = video
+    children = []
+    for child in item.get("carousel_media") or []:
+        entry = {"img_src": _best_candidate(child), "is_video": bool(child.get("video_versions"))}
+        child_video = _best_video(child)
+        if child_video:
+            entry["video_url"] = child_video
+        children.append(entry)
+    if children:
+        post["children"] = children
+        if not post["img_src"]:
+            post["img_src"] = children[0]["img_src"]
+    return post
+
+
+def parse_posts(payload: Any) -> List[Dict[str, Any]]:
+    """Find media nodes anywhere in an Instagram JSON payload and convert them to posts."""
+    posts: List[Dict[str, Any]] = []
+    stack = [payload]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, list):
+            stack.extend(reversed(obj))
+            continue
+        if not isinstance(obj, dict):
+            continue
+        if obj.get("shortcode") and "display_url" in obj:
+            posts.append(_graph_node_to_post(obj))
+        elif obj.get("code") and ("image_versions2" in obj or "carousel_media" in obj):
+            posts.append(_v1_item_to_post(obj))
+        else:
+            stack.extend(reversed(list(obj.values())))
+    return [p for p in posts if p.get("img_src")]
+
+
+_TIMELINE_KEYS = (
+    "edge_owner_to_timeline_media",
+    "xdt_api__v1__feed__user_timeline_graphql_connection",
+)
+
+
+def is_timeline_payload(payload: Any) -> bool:
+    """True for profile/timeline responses (even empty ones), as opposed to
+    unrelated graphql queries that share the same endpoint."""
+    if isinstance(payload, dict) and "items" in payload and "num_results" in payload:
+        return True
+    stack = [payload]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            if any(k in obj for k in _TIMELINE_KEYS):
+                return True
+            stack.extend(v for v in obj.values() if isinstance(v, (dict, list)))
+        elif isinstance(obj, list):
+            stack.extend(v for v in obj if isinstance(v, (dict, list)))
+    return False
+
+
+def dedupe_posts(posts: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    seen = set()
+    unique = []
+    for p in posts:
+        key = p.get("shortcode") or p.get("img_src")
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(p)
+    return unique
+
+
+def response_json(request) -> Any:
+    """Decode a captured selenium-wire response body as JSON (None if not JSON)."""
+    response = getattr(request, "response", None)
+    if response is None or response.status_code != 200 or not response.body:
+        return None
+    body = response.body
+    encoding = response.headers.get("Content-Encoding", "identity")
+    if encoding and encoding != "identity":
+        try:
+            from seleniumwire.utils import decode
+
+            body = decode(body, encoding)
+        except Exception:
+            return None
+    try:
+        return json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def collect_api_posts(driver) -> tuple[List[Dict[str, Any]], int]:
+    """Parse posts from captured API responses; returns (posts, timeline responses seen)."""
+    posts: List[Dict[str, Any]] = []
+    responses = 0
+    for request in driver.requests:
+        payload = response_json(request)
+        if payload is None or not is_timeline_payload(payload):
+            continue
+        responses += 1
+        posts.extend(parse_posts(payload))
+    return dedupe_posts(posts), responses
+
+
+def new_api_posts(driver, processed: set) -> List[Dict[str, Any]]:
+    """Posts from captured responses not handled yet; ``processed`` tracks request ids."""
+    posts: List[Dict[str, Any]] = []
+    for request in driver.requests:
+        if request.id in processed or request.response is None:
+            continue
+        processed.add(request.id)
+        payload = response_json(request)
+        if payload is not None and is_timeline_payload(payload):
+            posts.extend(parse_posts(payload))
+    return posts
+
+
+def wait_for_api_posts(driver, timeout: float, poll: float = 0.25) -> List[Dict[str, Any]]:
+    """Poll captured traffic until a profile/timeline response yields posts.
+
+    Returns early (possibly empty) once a timeline response has been parsed
+    without posts, e.g. for private or empty profiles, or on a login redirect.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        posts, responses = collect_api_posts(driver)
+        if posts or responses:
+            return posts
+        if time.monotonic() >= deadline:
+            return []
+        try:
+            if "/accounts/login" in driver.current_url:
+                return []
+        except Exception:
+            pass
+        time.sleep(poll)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+from utils.cache import cache_path
+
+
+class JobQueue:
+    """Durable FIFO of profile jobs in SQLite.
+
+    Jobs move ``queued`` -> ``running`` -> ``done``/``failed``; a failed job
+    is put back in the queue until it has been tried ``max_attempts`` times.
+    Jobs left ``running`` by a worker that died are requeued when the queue
+    is opened again.
+    """
+
+    def __init__(self, path: str | None = None, cache_dir: str | None = None, max_attempts: int = 3):
+        self.path = path or cache_path(cache_dir, "jobs.sqlite")
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, job TEXT NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0,"
+                " result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                (time.time(),),
+            )
+
+    def enqueue(self, job: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO jobs (job, created_at, updated_at) VALUES (?, ?, ?)",
+                (json.dumps(job), now, now),
+            )
+            return cur.lastrowid
+
+    def claim(self) -> Tuple[int, Dict[str, Any]] | None:
+        """Mark the oldest queued job as running and return ``(id, job)``."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id, job FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ?"
+                " WHERE id = ?",
+                (time.time(), row[0]),
+            )
+        return row[0], json.loads(row[1])
+
+    def complete(self, job_id: int, result: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, updated_at = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id),
+            )
+
+    def fail(self, job_id: int, error: str, result: Dict[str, Any] | None = None) -> str:
+        """Record a failure; returns the new status (``queued`` to retry, or ``failed``)."""
+        with self._lock, self._conn:
+            (attempts,) = self._conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            status = "queued" if attempts < self.max_attempts else "failed"
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, updated_at = ? WHERE id = ?",
+                (
+                    status,
+                    error,
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    time.time(),
+                    job_id,
+                ),
+            )
+        return status
+
+    def requeue(self, job_id: int) -> None:
+        """Give a claimed job back without counting the attempt (e.g. on shutdown)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), updated_at = ?"
+                " WHERE id = ? AND status = 'running'",
+                (time.time(), job_id),
+            )
+
+    def get(self, job_id: int) -> Dict[str, Any] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, job, status, attempts, result, error, created_at, updated_at"
+                " FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "job": json.loads(row[1]),
+            "status": row[2],
+            "attempts": row[3],
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        counts.update({status: n for status, n in rows})
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
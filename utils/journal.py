@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator
+
+from utils.cache import cache_path
+from utils.pagination import post_key
+
+# Posts in these states need nothing more on a rerun
+DONE_STATES = ("inserted", "skipped")
+
+_POST_FIELDS = ("state", "object_name", "sha1", "title", "description", "asset_id", "error")
+
+
+class RunJournal:
+    """Progress of each ``(run_id, username)``, persisted in SQLite, so a run
+    that failed part way can be resumed by rerunning with the same run id.
+
+    The scrape is recorded once it has completed; each post then moves
+    ``scraped`` -> ``uploaded`` -> ``inserted`` (or ``skipped`` when it was
+    already stored). A rerun reuses the recorded scrape and only repeats the
+    steps that did not finish. Runs untouched for ``keep_days`` are pruned.
+    """
+
+    def __init__(self, path: str | None = None, cache_dir: str | None = None, keep_days: float = 14):
+        self.path = path or cache_path(cache_dir, "runs.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " run_id TEXT NOT NULL, username TEXT NOT NULL, scrape TEXT,"
+                " updated_at REAL NOT NULL, PRIMARY KEY (run_id, username))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS posts ("
+                " run_id TEXT NOT NULL, username TEXT NOT NULL, key TEXT NOT NULL,"
+                " seq INTEGER NOT NULL, post TEXT NOT NULL, state TEXT NOT NULL DEFAULT 'scraped',"
+                " object_name TEXT, sha1 TEXT, title TEXT, description TEXT, asset_id TEXT,"
+                " error TEXT, updated_at REAL NOT NULL, PRIMARY KEY (run_id, username, key))"
+            )
+            cutoff = time.time() - keep_days * 86400
+            self._conn.execute(
+                "DELETE FROM posts WHERE (run_id, username) IN"
+                " (SELECT run_id, username FROM runs WHERE updated_at < ?)",
+                (cutoff,),
+            )
+            self._conn.execute("DELETE FROM runs WHERE updated_at < ?", (cutoff,))
+
+    def scrape(self, run_id: str, username: str) -> Dict[str, Any] | None:
+        """The recorded scrape summary, or None if the scrape never completed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT scrape FROM runs WHERE run_id = ? AND username = ?",
+                (run_id, username.lower()),
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def finish_scrape(self, run_id: str, username: str, summary: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (run_id, username, scrape, updated_at) VALUES (?, ?, ?, ?)",
+                (run_id, username.lower(), json.dumps(summary, ensure_ascii=False), time.time()),
+            )
+
+    def add_post(self, run_id: str, username: str, post: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a scraped post (kept as is if already known); returns its record."""
+        key = post_key(post)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, username, updated_at) VALUES (?, ?, ?)",
+                (run_id, username.lower(), now),
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO posts (run_id, username, key, seq, post, updated_at)"
+                " SELECT ?, ?, ?, COUNT(*), ?, ? FROM posts WHERE run_id = ? AND username = ?",
+                (run_id, username.lower(), key, json.dumps(post, ensure_ascii=False), now,
+                 run_id, username.lower()),
+            )
+            row = self._conn.execute(
+                "SELECT " + ", ".join(_POST_FIELDS) + " FROM posts"
+                " WHERE run_id = ? AND username = ? AND key = ?",
+                (run_id, username.lower(), key),
+            ).fetchone()
+        return dict(zip(_POST_FIELDS, row))
+
+    def posts(self, run_id: str, username: str) -> Iterator[Dict[str, Any]]:
+        """Recorded posts in scrape order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT post FROM posts WHERE run_id = ? AND username = ? ORDER BY seq",
+                (run_id, username.lower()),
+            ).fetchall()
+        for (post,) in rows:
+            yield json.loads(post)
+
+    def update_post(self, run_id: str, username: str, post: Dict[str, Any], **fields) -> None:
+        unknown = set(fields) - set(_POST_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown journal fields: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE posts SET {assignments}, updated_at = ?"
+                " WHERE run_id = ? AND username = ? AND key = ?",
+                (*fields.values(), time.time(), run_id, username.lower(), post_key(post)),
+            )
+            self._conn.execute(
+                "UPDATE runs SET updated_at = ? WHERE run_id = ? AND username = ?",
+                (time.time(), run_id, username.lower()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
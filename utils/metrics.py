@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+
+class Metrics:
+    """Span timings and counters for one process.
+
+    Every finished span is appended to ``jsonl_path`` as one JSON line
+    (name, duration, ok, plus any fields the caller attached). Aggregates
+    (per-span count/sum/max/errors and counters) are kept in memory and
+    written to ``prom_path`` in Prometheus text format on ``flush()``.
+    """
+
+    def __init__(self, jsonl_path: str | None = None, prom_path: str | None = None):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self._lock = threading.Lock()
+        self._file = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+        self._spans: Dict[str, list] = {}
+        self._counters: Dict[str, float] = {}
+
+    def observe(self, name: str, seconds: float, ok: bool = True, **fields: Any) -> None:
+        with self._lock:
+            stats = self._spans.setdefault(name, [0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            if not ok:
+                stats[3] += 1
+            if self._file is not None:
+                record = {
+                    "ts": round(time.time(), 3),
+                    "span": name,
+                    "duration_ms": round(seconds * 1000, 2),
+                    "ok": ok,
+                    **fields,
+                }
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+
+    @contextmanager
+    def span(self, name: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+        """Time the block; the yielded dict takes extra fields (``ok`` overrides)."""
+        started = time.perf_counter()
+        ok = True
+        try:
+            yield fields
+        except BaseException as e:
+            ok = False
+            fields.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            ok = fields.pop("ok", ok)
+            self.observe(name, time.perf_counter() - started, ok, **fields)
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "spans": {
+                    name: {
+                        "count": s[0],
+                        "sum_s": round(s[1], 4),
+                        "max_s": round(s[2], 4),
+                        "errors": s[3],
+                    }
+                    for name, s in self._spans.items()
+                },
+                "counters": dict(self._counters),
+            }
+
+    def prometheus_text(self) -> str:
+        snap = self.snapshot()
+        lines = [
+            "# HELP igs_span_seconds Time spent per stage.",
+            "# TYPE igs_span_seconds summary",
+        ]
+        for name, s in sorted(snap["spans"].items()):
+            lines.append(f'igs_span_seconds_count{{span="{name}"}} {s["count"]}')
+            lines.append(f'igs_span_seconds_sum{{span="{name}"}} {s["sum_s"]}')
+        lines += ["# HELP igs_span_seconds_max Slowest span per stage.", "# TYPE igs_span_seconds_max gauge"]
+        for name, s in sorted(snap["spans"].items()):
+            lines.append(f'igs_span_seconds_max{{span="{name}"}} {s["max_s"]}')
+        lines += ["# HELP igs_span_errors_total Spans that raised.", "# TYPE igs_span_errors_total counter"]
+        for name, s in sorted(snap["spans"].items()):
+            lines.append(f'igs_span_errors_total{{span="{name}"}} {s["errors"]}')
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"# TYPE igs_{name}_total counter")
+            lines.append(f"igs_{name}_total {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        if not self.prom_path:
+            return
+        tmp_path = self.prom_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, self.prom_path)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                summary = {"ts": round(time.time(), 3), "summary": True}
+                summary["counters"] = dict(self._counters)
+                self._file.write(json.dumps(summary) + "\n")
+                self._file.close()
+                self._file = None
+
+
+# Process-wide instance; aggregates in memory until configure() adds sinks
+_metrics = Metrics()
+
+
+def configure(jsonl_path: str | None = None, prom_path: str | None = None) -> Metrics:
+    global _metrics
+    _metrics.close()
+    _metrics = Metrics(jsonl_path, prom_path)
+    return _metrics
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def span(name: str, **fields: Any):
+    return _metrics.span(name, **fields)
+
+
+def observe(name: str, seconds: float, ok: bool = True, **fields: Any) -> None:
+    _metrics.observe(name, seconds, ok, **fields)
+
+
+def count(name: str, value: float = 1) -> None:
+    _metrics.count(name, value)
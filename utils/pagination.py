@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List
+
+from utils.watermark import is_seen, post_shortcode
+
+# Counts nodes added anywhere in the page and when the last batch landed, so
+# we can wait for "new posts rendered and DOM quiet" instead of sleeping.
+_OBSERVE_JS = """
+if (!window.__igsObserver && document.body) {
+  window.__igsMutations = 0;
+  window.__igsLastMutation = performance.now();
+  window.__igsObserver = new MutationObserver(function (records) {
+    for (var i = 0; i < records.length; i++) window.__igsMutations += records[i].addedNodes.length;
+    window.__igsLastMutation = performance.now();
+  });
+  window.__igsObserver.observe(document.body, {childList: true, subtree: true});
+}
+return window.__igsMutations;
+"""
+
+_SCROLL_JS = """
+window.scrollTo(0, document.documentElement.scrollHeight);
+return window.__igsMutations || 0;
+"""
+
+_PROGRESS_JS = """
+return [window.__igsMutations || 0, performance.now() - (window.__igsLastMutation || 0)];
+"""
+
+# Empties post tiles more than a viewport above the fold. Every tile there
+# has already been extracted; its box keeps its height so scrolling is unchanged.
+_EVICT_JS = """
+var margin = window.innerHeight;
+var links = document.querySelectorAll('a[href]');
+var evicted = 0;
+for (var i = 0; i < links.length; i++) {
+  var a = links[i];
+  if (a.dataset.igsEvicted || !a.querySelector('img')) continue;
+  var r = a.getBoundingClientRect();
+  if (r.bottom > -margin) continue;
+  a.style.display = 'block';
+  a.style.height = r.height + 'px';
+  while (a.firstChild) a.removeChild(a.firstChild);
+  a.dataset.igsEvicted = '1';
+  evicted++;
+}
+return evicted;
+"""
+
+
+def parse_until(value: str) -> int:
+    """argparse type for ``--until``: a YYYY-MM-DD date (UTC) or epoch seconds."""
+    if value.isdigit():
+        return int(value)
+    try:
+        dt = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD or epoch seconds, got {value!r}")
+    return int(dt.timestamp())
+
+
+def post_filter(since: Dict[str, Any] | None, until: int | None):
+    """Pagination check: stop at the first already-seen post or one older
+    than ``until`` (epoch seconds); pinned posts are only skipped."""
+
+    def check(post: Dict[str, Any]) -> str | None:
+        too_old = (
+            until is not None
+            and post.get("taken_at") is not None
+            and post["taken_at"] < until
+        )
+        if not (too_old or is_seen(post, since)):
+            return None
+        return "skip" if post.get("pinned") else "stop"
+
+    return check
+
+
+def post_key(post: Dict[str, Any]) -> str | None:
+    return post_shortcode(post) or post.get("img_src")
+
+
+def wait_for_growth(
+    driver, before: int, timeout: float, idle_ms: float = 400, poll: float = 0.1
+) -> bool:
+    """Wait until nodes were added after ``before`` and the DOM has been quiet
+    for ``idle_ms``. Returns False if nothing new arrived within ``timeout``."""
+    deadline = time.monotonic() + timeout
+    grew = False
+    while time.monotonic() < deadline:
+        count, quiet_ms = driver.execute_script(_PROGRESS_JS)
+        grew = count > before
+        if grew and quiet_ms >= idle_ms:
+            return True
+        time.sleep(poll)
+    return grew
+
+
+def paginate(
+    driver,
+    collect: Callable[[Any], List[Dict[str, Any]]],
+    check: Callable[[Dict[str, Any]], str | None] | None = None,
+    max_posts: int | None = None,
+    max_scrolls: int = 50,
+    round_timeout: float = 10.0,
+    idle_ms: float = 400,
+    evict_every: int = 5,
+    debug: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Yield posts as they appear while scrolling the profile grid.
+
+    ``collect(driver)`` returns the posts currently available (already seen
+    ones are fine: posts are deduped here as they arrive). ``check(post)``
+    may return ``"skip"`` to drop a post or ``"stop"`` to end pagination,
+    e.g. at a date cutoff or an already-known post. Stops after
+    ``max_posts`` posts, ``max_scrolls`` scrolls, or two scrolls that
+    brought nothing new.
+    """
+    driver.execute_script(_OBSERVE_JS)
+    seen = set()
+    emitted = 0
+    stale = 0
+    scrolls = 0
+    while True:
+        fresh = 0
+        for post in collect(driver):
+            key = post_key(post)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            fresh += 1
+            verdict = check(post) if check else None
+            if verdict == "stop":
+                return
+            if verdict == "skip":
+                continue
+            yield post
+            emitted += 1
+            if max_posts and emitted >= max_posts:
+                return
+        stale = 0 if fresh else stale + 1
+        if scrolls >= max_scrolls or stale >= 2:
+            return
+        if evict_every and scrolls and scrolls % evict_every == 0:
+            evicted = driver.execute_script(_EVICT_JS)
+            if debug and evicted:
+                print(f"[DEBUG] Evicted {evicted} extracted tiles from the DOM")
+        before = driver.execute_script(_SCROLL_JS)
+        scrolls += 1
+        grew = wait_for_growth(driver, before, round_timeout, idle_ms)
+        if debug:
+            print(f"[DEBUG] scroll {scrolls}: {len(seen)} posts seen, new nodes={'yes' if grew else 'no'}")
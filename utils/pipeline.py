@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import queue
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+_STOP = object()
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_process_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the process-wide pool of ``workers`` processes, so successive and
+    concurrent pipelines share warm processes instead of each forking its own.
+    A pool broken by a dead child is replaced."""
+    workers = max(1, workers)
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None or getattr(pool, "_broken", False):
+            pool = ProcessPoolExecutor(max_workers=workers)
+            _pools[workers] = pool
+        return pool
+
+
+class Stage:
+    """One step of a pipeline.
+
+    ``fn`` takes an item and returns the (possibly updated) item, or ``None``
+    to finish the item early (later stages are skipped for it). ``workers``
+    bounds the stage's concurrency; with ``processes=True`` calls run in a
+    process pool (``fn`` and items must be picklable).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        workers: int = 1,
+        processes: bool = False,
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.processes = processes
+
+
+class PipelineItem:
+    def __init__(self, index: int, value: Any):
+        self.index = index
+        self.value = value
+        self.error: BaseException | None = None
+        # Stage that failed or finished the item early (None: ran to the end)
+        self.stage: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def run_pipeline(
+    source: Iterable[Any],
+    stages: List[Stage],
+    queue_size: int = 8,
+    executor: Executor | None = None,
+) -> Iterator[PipelineItem]:
+    """Stream items from ``source`` through ``stages``; yield them as they finish.
+
+    Each stage reads from its own bounded queue, so a slow stage applies
+    backpressure upstream instead of buffering everything in memory. Items
+    are yielded in completion order; failures are captured per item.
+    ``processes`` stages run on ``executor`` (e.g. ``get_process_pool``);
+    without one each gets a private pool, shut down when the pipeline ends.
+    """
+    queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in stages]
+    out: queue.Queue = queue.Queue()
+    owned: List[Executor] = []
+    executors: List[Executor | None] = []
+    for stage in stages:
+        if stage.processes and executor is None:
+            owned.append(ProcessPoolExecutor(max_workers=stage.workers))
+            executors.append(owned[-1])
+        else:
+            executors.append(executor if stage.processes else None)
+    remaining = [stage.workers for stage in stages]
+    lock = threading.Lock()
+
+    def downstream(i: int) -> queue.Queue:
+        return queues[i + 1] if i + 1 < len(stages) else out
+
+    def work(i: int) -> None:
+        stage, inbox, executor = stages[i], queues[i], executors[i]
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                break
+            if item.ok and item.stage is None:
+                try:
+                    if executor is not None:
+                        result = executor.submit(stage.fn, item.value).result()
+                    else:
+                        result = stage.fn(item.value)
+                    if result is None:
+                        item.stage = stage.name
+                    else:
+                        item.value = result
+                except (Exception, SystemExit) as e:
+                    item.error = e
+                    item.stage = stage.name
+            downstream(i).put(item)
+        with lock:
+            remaining[i] -= 1
+            last = remaining[i] == 0
+        if last:
+            nxt = downstream(i)
+            for _ in range(stages[i + 1].workers if nxt is not out else 1):
+                nxt.put(_STOP)
+
+    def feed() -> None:
+        first = queues[0] if stages else out
+        index = 0
+        try:
+            for value in source:
+                first.put(PipelineItem(index, value))
+                index += 1
+        except (Exception, SystemExit) as e:
+            failed = PipelineItem(index, None)
+            failed.error = e
+            failed.stage = "source"
+            out.put(failed)
+        for _ in range(stages[0].workers if stages else 1):
+            first.put(_STOP)
+
+    threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+    for i, stage in enumerate(stages):
+        for n in range(stage.workers):
+            threads.append(
+                threading.Thread(target=work, args=(i,), name=f"{stage.name}-{n}", daemon=True)
+            )
+    for t in threads:
+        t.start()
+    try:
+        while True:
+            item = out.get()
+            if item is _STOP:
+                break
+            yield item
+    finally:
+        for private in owned:
+            private.shutdown(wait=False, cancel_futures=True)
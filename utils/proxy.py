@@ -1,51 +1,74 @@
+import atexit
+import hashlib
 import json
 import os
+import shutil
 import tempfile
+import threading
 import zipfile
+from collections import OrderedDict
 
+# Built extensions, keyed by a hash of their settings. Chrome reads the zip
+# when the driver starts, so evicted files can be deleted right away.
+_MAX_CACHED_EXTENSIONS = 32
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_dir = None
 
-def build_proxy_auth_extension(
-    scheme: str, host: str, port: int, username: str, password: str
-) -> str:
-    """Create a temporary Chrome extension that sets a fixed proxy and handles auth.
 
-    Returns the path to the created .zip file.
-    """
-    manifest = {
+def _extension_dir() -> str:
+    global _cache_dir
+    if _cache_dir is None:
+        _cache_dir = tempfile.mkdtemp(prefix="proxy_ext_")
+        atexit.register(shutil.rmtree, _cache_dir, True)
+    return _cache_dir
+
+
+def _manifest(manifest_version: int) -> dict:
+    if manifest_version == 2:
+        return {
+            "version": "1.0.0",
+            "manifest_version": 2,
+            "name": "Chrome Proxy",
+            "permissions": [
+                "proxy",
+                "tabs",
+                "unlimitedStorage",
+                "storage",
+                "<all_urls>",
+                "webRequest",
+                "webRequestBlocking",
+            ],
+            "background": {"scripts": ["background.js"]},
+            "minimum_chrome_version": "22.0.0",
+        }
+    return {
         "version": "1.0.0",
-        "manifest_version": 2,
+        "manifest_version": 3,
         "name": "Chrome Proxy",
-        "permissions": [
-            "proxy",
-            "tabs",
-            "unlimitedStorage",
-            "storage",
-            "<all_urls>",
-            "webRequest",
-            "webRequestBlocking",
-        ],
-        "background": {"scripts": ["background.js"]},
-        "minimum_chrome_version": "22.0.0",
+        "permissions": ["proxy", "storage", "webRequest", "webRequestAuthProvider"],
+        "host_permissions": ["<all_urls>"],
+        "background": {"service_worker": "background.js"},
+        "minimum_chrome_version": "108",
     }
 
-    scheme_for_ext = "socks5" if scheme.startswith("socks") else "http"
-    background_js = f"""
-var config = {{
-  mode: "fixed_servers",
-  rules: {{
-    singleProxy: {{
-      scheme: "{scheme_for_ext}",
-      host: "{host}",
-      port: parseInt({port})
-    }},
-    bypassList: ["localhost"]
-  }}
-}};
-
-chrome.proxy.settings.set({{value: config, scope: "regular"}}, function() {{}});
 
+def _background_js(
+    scheme: str, host: str, port: int, username: str, password: str, manifest_version: int
+) -> str:
+    scheme_for_ext = "socks5" if scheme.startswith("socks") else "http"
+    config = {
+        "mode": "fixed_servers",
+        "rules": {
+            "singleProxy": {"scheme": scheme_for_ext, "host": host, "port": int(port)},
+            "bypassList": ["localhost"],
+        },
+    }
+    credentials = json.dumps({"username": username, "password": password})
+    if manifest_version == 2:
+        listener = f"""
 function callbackFn(details) {{
-  return {{ authCredentials: {{ username: "{username}", password: "{password}" }} }};
+  return {{ authCredentials: {credentials} }};
 }}
 
 chrome.webRequest.onAuthRequired.addListener(
@@ -54,19 +77,64 @@ chrome.webRequest.onAuthRequired.addListener(
   ['blocking']
 );
 """
+    else:
+        # MV3 service workers cannot block synchronously; answer asynchronously
+        listener = f"""
+chrome.webRequest.onAuthRequired.addListener(
+  function (details, callback) {{
+    callback({{ authCredentials: {credentials} }});
+  }},
+  {{ urls: ["<all_urls>"] }},
+  ['asyncBlocking']
+);
+"""
+    return f"""
+var config = {json.dumps(config)};
+
+chrome.proxy.settings.set({{value: config, scope: "regular"}}, function() {{}});
+{listener}"""
 
-    tmp_dir = tempfile.mkdtemp(prefix="proxy_ext_")
-    ext_zip_path = os.path.join(tmp_dir, "proxy_auth_plugin.zip")
-    manifest_path = os.path.join(tmp_dir, "manifest.json")
-    background_path = os.path.join(tmp_dir, "background.js")
 
-    with open(manifest_path, "w", encoding="utf-8") as f:
-        f.write(json.dumps(manifest))
-    with open(background_path, "w", encoding="utf-8") as f:
-        f.write(background_js)
+def build_proxy_auth_extension(
+    scheme: str,
+    host: str,
+    port: int,
+    username: str,
+    password: str,
+    manifest_version: int = 3,
+) -> str:
+    """Return the path of a Chrome extension zip that sets a fixed proxy and handles auth.
+
+    The zip is built once per distinct set of arguments and reused; cached
+    files live in one temp directory that is removed at interpreter exit.
+    """
+    if manifest_version not in (2, 3):
+        raise ValueError(f"Unsupported manifest_version: {manifest_version}")
+    key = hashlib.sha256(
+        json.dumps([scheme, host, int(port), username, password, manifest_version]).encode("utf-8")
+    ).hexdigest()[:24]
+
+    with _cache_lock:
+        path = _cache.get(key)
+        if path and os.path.exists(path):
+            _cache.move_to_end(key)
+            return path
 
-    with zipfile.ZipFile(ext_zip_path, "w") as zp:
-        zp.write(manifest_path, arcname="manifest.json")
-        zp.write(background_path, arcname="background.js")
+        path = os.path.join(_extension_dir(), f"proxy_auth_{key}.zip")
+        tmp_path = path + ".tmp"
+        with zipfile.ZipFile(tmp_path, "w") as zp:
+            zp.writestr("manifest.json", json.dumps(_manifest(manifest_version)))
+            zp.writestr(
+                "background.js",
+                _background_js(scheme, host, port, username, password, manifest_version),
+            )
+        os.replace(tmp_path, path)
+        _cache[key] = path
 
-    return ext_zip_path
+        while len(_cache) > _MAX_CACHED_EXTENSIONS:
+            _, old_path = _cache.popitem(last=False)
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    return path
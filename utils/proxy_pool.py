@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import os
+import secrets
+import threading
+import time
+from typing import List
+from urllib.parse import urlparse
+
+SID_PLACEHOLDER = "{sid}"
+
+
+def load_proxy_list(spec: str) -> List[str]:
+    """Proxies from a file (one per line, ``#`` comments) or a comma-separated list."""
+    if os.path.isfile(spec):
+        with open(spec, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    else:
+        lines = [part.strip() for part in spec.split(",")]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def _redact(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.hostname}:{parsed.port}"
+
+
+class ProxyEndpoint:
+    """One proxy (optionally a template with ``{sid}``) and its health stats."""
+
+    def __init__(self, template: str):
+        self.template = template
+        self.sid = secrets.token_hex(4)
+        self.successes = 0
+        self.failures = 0
+        self.login_walls = 0
+        self.consecutive_failures = 0
+        self.latency_ewma: float | None = None
+        self.quarantined_until = 0.0
+        self.last_used = 0.0
+
+    @property
+    def url(self) -> str:
+        return self.template.replace(SID_PLACEHOLDER, self.sid)
+
+    @property
+    def rotates(self) -> bool:
+        return SID_PLACEHOLDER in self.template
+
+    def rotate(self) -> None:
+        self.sid = secrets.token_hex(4)
+
+    def score(self) -> float:
+        attempts = self.successes + self.failures
+        success_rate = (self.successes + 1) / (attempts + 2)
+        wall_rate = self.login_walls / attempts if attempts else 0.0
+        latency = self.latency_ewma if self.latency_ewma is not None else 5.0
+        return success_rate * (1.0 - wall_rate) / (1.0 + latency / 10.0)
+
+    def describe(self) -> str:
+        return (
+            f"{_redact(self.url)} ok={self.successes} fail={self.failures} "
+            f"walls={self.login_walls} latency={self.latency_ewma or 0:.2f}s score={self.score():.3f}"
+        )
+
+
+class ProxyLease:
+    def __init__(self, endpoint: ProxyEndpoint):
+        self.endpoint = endpoint
+        self.url = endpoint.url
+        self.started = time.monotonic()
+
+
+class ProxyPool:
+    """Picks a proxy per job and learns which endpoints work.
+
+    Each endpoint tracks success rate, latency (EWMA) and login-wall
+    redirects. ``lease()`` returns the healthiest endpoint (``strategy="best"``)
+    or the least recently used one (``"lru"``), skipping quarantined ones.
+    An endpoint is quarantined for ``quarantine_seconds`` after
+    ``quarantine_after`` consecutive failures. Templates containing ``{sid}``
+    keep a sticky session id (so warm drivers stay reusable) and get a fresh
+    one, i.e. a new exit IP, after a failure or login wall.
+    """
+
+    def __init__(
+        self,
+        proxies: List[str],
+        strategy: str = "best",
+        quarantine_after: int = 3,
+        quarantine_seconds: float = 300.0,
+        debug: bool = False,
+    ):
+        if not proxies:
+            raise ValueError("ProxyPool needs at least one proxy")
+        if strategy not in ("best", "lru"):
+            raise ValueError(f"Unknown proxy strategy: {strategy}")
+        self.endpoints = [ProxyEndpoint(p) for p in proxies]
+        self.strategy = strategy
+        self.quarantine_after = quarantine_after
+        self.quarantine_seconds = quarantine_seconds
+        self.debug = debug
+        self._lock = threading.Lock()
+
+    def lease(self) -> ProxyLease:
+        now = time.monotonic()
+        with self._lock:
+            available = [e for e in self.endpoints if e.quarantined_until <= now]
+            if not available:
+                # Everything is quarantined: use the one that comes back first
+                chosen = min(self.endpoints, key=lambda e: e.quarantined_until)
+            elif self.strategy == "lru":
+                chosen = min(available, key=lambda e: e.last_used)
+            else:
+                chosen = max(available, key=lambda e: (e.score(), -e.last_used))
+            chosen.last_used = now
+            return ProxyLease(chosen)
+
+    def report(
+        self,
+        lease: ProxyLease,
+        ok: bool,
+        latency: float | None = None,
+        login_wall: bool = False,
+    ) -> None:
+        endpoint = lease.endpoint
+        if latency is None:
+            latency = time.monotonic() - lease.started
+        with self._lock:
+            if endpoint.latency_ewma is None:
+                endpoint.latency_ewma = latency
+            else:
+                endpoint.latency_ewma = 0.7 * endpoint.latency_ewma + 0.3 * latency
+            if login_wall:
+                endpoint.login_walls += 1
+            if ok and not login_wall:
+                endpoint.successes += 1
+                endpoint.consecutive_failures = 0
+            else:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if endpoint.rotates and lease.url == endpoint.url:
+                    endpoint.rotate()
+                if endpoint.consecutive_failures >= self.quarantine_after:
+                    endpoint.quarantined_until = time.monotonic() + self.quarantine_seconds
+                    endpoint.consecutive_failures = 0
+                    if self.debug:
+                        print(f"[DEBUG] [proxy] quarantined {endpoint.describe()}")
+            if self.debug:
+                print(f"[DEBUG] [proxy] {endpoint.describe()}")
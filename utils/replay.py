@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Tuple
+
+
+def _headers(headers) -> List[Dict[str, str]]:
+    return [{"name": k, "value": v} for k, v in headers.items()]
+
+
+def _date(value) -> str:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    return datetime.now(timezone.utc).isoformat()
+
+
+def har_entries(requests) -> List[Dict[str, Any]]:
+    """HAR 1.2 entries for captured selenium-wire requests that got a response.
+
+    Bodies are stored base64-encoded exactly as received (still compressed
+    when the server compressed them) so replay can hand them back unchanged.
+    """
+    entries = []
+    for request in requests:
+        response = request.response
+        if response is None:
+            continue
+        entries.append(
+            {
+                "startedDateTime": _date(getattr(request, "date", None)),
+                "request": {
+                    "method": request.method,
+                    "url": request.url,
+                    "headers": _headers(request.headers),
+                    "bodySize": len(request.body or b""),
+                },
+                "response": {
+                    "status": response.status_code,
+                    "statusText": response.reason or "",
+                    "headers": _headers(response.headers),
+                    "content": {
+                        "size": len(response.body or b""),
+                        "mimeType": response.headers.get("Content-Type", ""),
+                        "encoding": "base64",
+                        "text": base64.b64encode(response.body or b"").decode("ascii"),
+                    },
+                },
+            }
+        )
+    return entries
+
+
+def save_har(driver, path: str) -> int:
+    """Write the driver's captured traffic to ``path``; returns the entry count."""
+    entries = har_entries(driver.requests)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    har = {"log": {"version": "1.2", "creator": {"name": "ig-scraper", "version": "1"}, "entries": entries}}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(har, f)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+class ReplayInterceptor:
+    """selenium-wire ``request_interceptor`` answering from a recorded HAR.
+
+    Requests are matched on method and URL; repeated requests get the
+    recorded responses in order (the last one repeats). Anything not in the
+    recording gets an empty 404, so a replayed session never touches the
+    network.
+    """
+
+    def __init__(self, path: str, debug: bool = False):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)["log"]["entries"]
+        self.debug = debug
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._responses: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = {}
+        for entry in entries:
+            key = (entry["request"]["method"], entry["request"]["url"])
+            self._responses.setdefault(key, deque()).append(entry["response"])
+
+    def _next(self, method: str, url: str) -> Dict[str, Any] | None:
+        with self._lock:
+            queue = self._responses.get((method, url))
+            if not queue:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def __call__(self, request) -> None:
+        response = self._next(request.method, request.url)
+        if response is None:
+            if self.debug:
+                print(f"[DEBUG] [replay] not recorded: {request.method} {request.url}")
+            request.create_response(status_code=404, headers={"Content-Length": "0"}, body=b"")
+            return
+        content = response.get("content") or {}
+        body = base64.b64decode(content.get("text") or "")
+        # Drop hop-by-hop framing; the body is served in one piece
+        headers = [
+            (h["name"], h["value"])
+            for h in response.get("headers") or []
+            if h["name"].lower() not in ("transfer-encoding", "connection", "content-length")
+        ]
+        headers.append(("Content-Length", str(len(body))))
+        request.create_response(status_code=response["status"], headers=headers, body=body)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import hashlib
+import tempfile
+from typing import Iterator
+
+from utils import metrics
+
+DEFAULT_MAX_MEMORY = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class SpooledBody:
+    """Bytes written in chunks, sha1-hashed as they arrive and kept in memory
+    up to ``max_memory`` bytes, then in a temporary file.
+
+    Reads like a file (``read``/``seek``/``tell``/``len``) so it can be passed
+    as a request body; ``HttpClient`` rewinds it before each retry.
+    """
+
+    def __init__(self, max_memory: int = DEFAULT_MAX_MEMORY):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self._hash = hashlib.sha1()
+        self.size = 0
+
+    @classmethod
+    def from_bytes(cls, data: bytes, max_memory: int = DEFAULT_MAX_MEMORY) -> "SpooledBody":
+        body = cls(max_memory)
+        body.write(data)
+        return body
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def sha1(self) -> str:
+        return self._hash.hexdigest()
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[bytes]:
+        self._file.seek(0)
+        while True:
+            chunk = self._file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def getvalue(self) -> bytes:
+        """The whole body (for decoders that need it all, e.g. WebP conversion)."""
+        self._file.seek(0)
+        return self._file.read()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "SpooledBody":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def spool_response(resp, max_memory: int = DEFAULT_MAX_MEMORY) -> SpooledBody:
+    """Drain a ``stream=True`` response into a ``SpooledBody`` and close it."""
+    body = SpooledBody(max_memory)
+    try:
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            if chunk:
+                body.write(chunk)
+    except BaseException:
+        body.close()
+        raise
+    finally:
+        resp.close()
+    metrics.count("http_bytes_received", body.size)
+    return body
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable
+
+from utils.cache import cache_path
+
+_SHORTCODE_RE = re.compile(r"/(?:p|reel|tv)/([A-Za-z0-9_-]+)")
+
+
+def post_shortcode(post: Dict[str, Any]) -> str | None:
+    if post.get("shortcode"):
+        return post["shortcode"]
+    m = _SHORTCODE_RE.search(post.get("permalink") or "")
+    return m.group(1) if m else None
+
+
+def is_seen(post: Dict[str, Any], mark: Dict[str, Any] | None) -> bool:
+    """True if ``post`` is at or older than the high-water ``mark``."""
+    if not mark:
+        return False
+    code = post_shortcode(post)
+    if code and code == mark.get("shortcode"):
+        return True
+    taken_at, mark_at = post.get("taken_at"), mark.get("taken_at")
+    return taken_at is not None and mark_at is not None and taken_at <= mark_at
+
+
+def newest_mark(posts: Iterable[Dict[str, Any]]) -> Dict[str, Any] | None:
+    """High-water mark for a newest-first list of posts (pinned ones ignored).
+
+    A mark is a valid entry too, so a running mark can be folded forward
+    one post at a time; ``None`` entries are skipped.
+    """
+    best = None
+    for post in posts:
+        if not post or post.get("pinned"):
+            continue
+        code = post_shortcode(post)
+        if not code:
+            continue
+        if best is None:
+            best = {"shortcode": code, "taken_at": post.get("taken_at")}
+        elif (post.get("taken_at") or 0) > (best.get("taken_at") or 0):
+            best = {"shortcode": code, "taken_at": post.get("taken_at")}
+    return best
+
+
+class HighWaterMarks:
+    """Newest post seen per username, persisted in SQLite."""
+
+    def __init__(self, path: str | None = None, cache_dir: str | None = None):
+        self.path = path or cache_path(cache_dir, "state.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS marks ("
+                " username TEXT PRIMARY KEY, shortcode TEXT, taken_at INTEGER,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    def get(self, username: str) -> Dict[str, Any] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT shortcode, taken_at FROM marks WHERE username = ?",
+                (username.lower(),),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"shortcode": row[0], "taken_at": row[1]}
+
+    def advance(self, username: str, posts: Iterable[Dict[str, Any]]) -> Dict[str, Any] | None:
+        """Move the mark to the newest of ``posts`` (no-op when there is none)."""
+        mark = newest_mark(posts)
+        if mark is None:
+            return self.get(username)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO marks (username, shortcode, taken_at, updated_at)"
+                " VALUES (?, ?, ?, ?)",
+                (username.lower(), mark["shortcode"], mark.get("taken_at"), time.time()),
+            )
+        return mark
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,293 @@
+import argparse
+import ipaddress
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Set
+
+from launch_and_store import (
+    JOB_OPTIONS,
+    add_store_arguments,
+    build_processor,
+    check_store_arguments,
+)
+from scraper import create_driver
+from utils import metrics
+from utils.driver_pool import DriverPool
+from utils.jobqueue import JobQueue
+
+JOB_KEYS = {"username", "project_id", "proxy", "run_id", *JOB_OPTIONS}
+
+
+class Worker:
+    """Pulls jobs from the queue on ``concurrency`` threads sharing warm drivers.
+
+    ``drain()`` stops claiming new jobs and waits for the running ones; jobs
+    still running when the drain times out go back to the queue.
+    """
+
+    def __init__(self, process, queue: JobQueue, pool: DriverPool, concurrency: int, poll: float = 1.0):
+        self.process = process
+        self.queue = queue
+        self.pool = pool
+        self.poll = poll
+        self.draining = threading.Event()
+        self.wake = threading.Event()
+        self.active: Dict[int, str] = {}
+        # Jobs requeued by a timed-out drain; their threads must not record a result
+        self.abandoned: Set[int] = set()
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"worker-{i}", daemon=True)
+            for i in range(max(1, concurrency))
+        ]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def ready(self) -> bool:
+        return not self.draining.is_set() and all(t.is_alive() for t in self._threads)
+
+    def _loop(self) -> None:
+        while not self.draining.is_set():
+            claimed = self.queue.claim()
+            if claimed is None:
+                self.wake.wait(self.poll)
+                self.wake.clear()
+                continue
+            self._run(*claimed)
+
+    def _run(self, job_id: int, job: Dict[str, Any]) -> None:
+        with self._lock:
+            if self.draining.is_set():
+                # Claimed just as the drain started; leave it for the next worker
+                self.queue.requeue(job_id)
+                return
+            self.active[job_id] = job.get("username")
+        started = time.monotonic()
+        try:
+            result = dict(self.process(job, self.pool))
+        except (Exception, SystemExit) as e:
+            # Missing optional dependencies exit(2); fail the job, keep the worker
+            result = {"username": job.get("username"), "status": "error", "error": repr(e)}
+        result["job_id"] = job_id
+        result["elapsed_s"] = round(time.monotonic() - started, 3)
+        with self._lock:
+            self.active.pop(job_id, None)
+            if job_id in self.abandoned:
+                self.abandoned.discard(job_id)
+                return
+            # Recorded under the lock so a drain cannot requeue the job meanwhile
+            if result.get("status") == "ok":
+                self.queue.complete(job_id, result)
+            else:
+                result["queue_status"] = self.queue.fail(
+                    job_id, result.get("error") or result.get("status"), result
+                )
+        metrics.get_metrics().flush()
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    def drain(self, timeout: float) -> bool:
+        self.draining.set()
+        self.wake.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            leftover = list(self.active)
+            self.abandoned.update(leftover)
+            for job_id in leftover:
+                self.queue.requeue(job_id)
+        return not leftover
+
+
+def parse_jobs(body: Any, default_project_id: str | None) -> List[Dict[str, Any]]:
+    """Validate a POST /jobs body: one job object, a list, or ``{"jobs": [...]}``."""
+    if isinstance(body, dict) and "jobs" in body:
+        body = body["jobs"]
+    jobs = body if isinstance(body, list) else [body]
+    parsed = []
+    for job in jobs:
+        if not isinstance(job, dict):
+            raise ValueError("each job must be a JSON object")
+        unknown = set(job) - JOB_KEYS
+        if unknown:
+            raise ValueError(f"unknown job keys: {', '.join(sorted(unknown))}")
+        username = str(job.get("username") or "").strip().lstrip("@")
+        if not username:
+            raise ValueError("job is missing 'username'")
+        if not (job.get("project_id") or default_project_id):
+            raise ValueError(f"job for {username} has no project_id")
+        # A fixed run id lets retries of this job resume from the run journal
+        parsed.append(dict(job, username=username, run_id=job.get("run_id") or str(uuid.uuid4())))
+    return parsed
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+
+def make_server(listen: str, worker: Worker, queue: JobQueue, args) -> ThreadingHTTPServer:
+    host, _, port = listen.rpartition(":")
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a):
+            pass
+
+        def _send(self, status: int, value: Any, ctype: str = "application/json") -> None:
+            body = value if isinstance(value, bytes) else json.dumps(value).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            if not args.token or self.headers.get("Authorization") == f"Bearer {args.token}":
+                return True
+            self._send(401, {"error": "unauthorized"})
+            return False
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path == "/healthz":
+                return self._send(200, {"status": "ok"})
+            if path == "/readyz":
+                ready = worker.ready()
+                return self._send(200 if ready else 503, {"ready": ready, "draining": worker.draining.is_set()})
+            if path == "/metrics":
+                counts = queue.counts()
+                text = metrics.get_metrics().prometheus_text() + "# TYPE igs_jobs gauge\n" + "".join(
+                    f'igs_jobs{{status="{status}"}} {n}\n' for status, n in sorted(counts.items())
+                )
+                return self._send(200, text.encode("utf-8"), "text/plain; version=0.0.4")
+            if not self._authorized():
+                return
+            if path == "/stats":
+                with worker._lock:
+                    active = dict(worker.active)
+                return self._send(
+                    200, {"queue": queue.counts(), "active": active, "draining": worker.draining.is_set()}
+                )
+            if path.startswith("/jobs/"):
+                try:
+                    record = queue.get(int(path[len("/jobs/"):]))
+                except ValueError:
+                    record = None
+                return self._send(200, record) if record else self._send(404, {"error": "not found"})
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.split("?", 1)[0].rstrip("/") != "/jobs":
+                return self._send(404, {"error": "not found"})
+            if not self._authorized():
+                return
+            if worker.draining.is_set():
+                return self._send(503, {"error": "draining"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                jobs = parse_jobs(json.loads(self.rfile.read(length) or b"null"), args.project_id)
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            ids = [queue.enqueue(job) for job in jobs]
+            worker.wake.set()
+            self._send(202, {"ids": ids})
+
+    server = ThreadingHTTPServer((host or "0.0.0.0", int(port)), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Long-running worker: scrape and store profiles queued over HTTP"
+    )
+    add_store_arguments(parser)
+    parser.add_argument(
+        "--listen",
+        default=os.getenv("WORKER_LISTEN", "127.0.0.1:8080"),
+        help=(
+            "host:port for the job/health API (default 127.0.0.1:8080, env WORKER_LISTEN); "
+            "other addresses need --token"
+        ),
+    )
+    parser.add_argument(
+        "--queue-db",
+        default=None,
+        help="SQLite job queue path (default jobs.sqlite in the cache dir)",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Tries per job before it is marked failed",
+    )
+    parser.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=300,
+        help="On SIGTERM, seconds to let running jobs finish before requeueing them",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=1.0,
+        help="Seconds between queue polls when idle",
+    )
+    parser.add_argument(
+        "--token",
+        default=os.getenv("WORKER_TOKEN"),
+        help="Require 'Authorization: Bearer TOKEN' on the job API (env WORKER_TOKEN)",
+    )
+    args = parser.parse_args()
+    check_store_arguments(parser, args)
+    host = args.listen.rpartition(":")[0]
+    if not args.token and not is_loopback(host):
+        # Jobs write to Supabase with the service role key; never take them unauthenticated
+        parser.error(f"--listen {args.listen} is reachable from other hosts; set --token or WORKER_TOKEN")
+
+    process = build_processor(args)
+    queue = JobQueue(path=args.queue_db, cache_dir=args.cache_dir, max_attempts=args.max_attempts)
+    pool = DriverPool(
+        create_driver,
+        size=args.concurrency,
+        max_pages=args.pool_max_pages,
+        max_rss_mb=args.pool_max_rss_mb,
+        max_idle=args.concurrency,
+        debug=args.debug,
+    )
+    worker = Worker(process, queue, pool, args.concurrency, poll=args.poll_interval)
+    server = make_server(args.listen, worker, queue, args)
+
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    worker.start()
+    print(f"[worker] listening on {args.listen}; queue {queue.path} {queue.counts()}", file=sys.stderr)
+
+    stop.wait()
+    print(f"[worker] draining (up to {args.drain_timeout:.0f}s)...", file=sys.stderr)
+    clean = worker.drain(args.drain_timeout)
+    if not clean:
+        print("[worker] drain timed out; unfinished jobs were requeued", file=sys.stderr)
+    server.shutdown()
+    server.server_close()
+    pool.close()
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()